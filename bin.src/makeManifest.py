@@ -0,0 +1,3 @@
+#!/usr/bin/env python
+from lsst.ci.hsc.gen2.manifest import makeManifest
+makeManifest()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""Run a command-line task script in a warm worker
+
+The worker server (warmWorkers.py; see lsst.ci.hsc.gen2.workerPool) is
+started if it isn't already running. If it can't be reached, the script is
+run here instead; but once the request has been sent, a failure of the
+server is reported rather than running the script a second time.
+
+The socket must be in a directory private to the user (it's created if
+necessary), since the request carries our whole environment.
+
+This deliberately uses only the standard library, and implements the client
+side of the protocol itself: importing lsst.ci.hsc.gen2 would import the
+stack, which is the start-up cost we're trying to avoid.
+"""
+import os
+import sys
+import json
+import stat
+import time
+import fcntl
+import socket
+import struct
+import argparse
+import subprocess
+
+
+def isPrivate(directory):
+    """Create the directory if necessary, and check that it's ours alone"""
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+    except OSError:
+        return False
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+def connect(path):
+    """Connect to the server, returning the socket or `None`"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def startServer(args):
+    """Start the server (unless another client beat us to it) and connect"""
+    with open(args.socket + ".lock", "a") as lockFile:
+        fcntl.flock(lockFile, fcntl.LOCK_EX)
+        sock = connect(args.socket)
+        if sock is not None:
+            return sock
+        server = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warmWorkers.py")
+        with open(args.socket + ".log", "a") as log:
+            subprocess.Popen([sys.executable, server, args.socket, "--workers", str(args.workers),
+                              "--idle-timeout", str(args.idle_timeout)],
+                             stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                             start_new_session=True)
+        deadline = time.monotonic() + args.start_timeout
+        while time.monotonic() < deadline:
+            sock = connect(args.socket)
+            if sock is not None:
+                return sock
+            time.sleep(0.1)
+    return None
+
+
+def run(sock, script, scriptArgs):
+    """Send a request, and relay the output and error
+
+    Returns
+    -------
+    code : `int` or `None`
+        Exit status of the script, or `None` if the request couldn't be sent
+        (so the server can't have started the script).
+    """
+    request = dict(script=script, args=scriptArgs, cwd=os.getcwd(), env=dict(os.environ))
+    try:
+        # The request is only acted on once its final newline arrives
+        sock.sendall(json.dumps(request).encode() + b"\n")
+    except OSError:
+        return None
+    reader = sock.makefile("rb")
+    streams = {b"O": sys.stdout.buffer, b"E": sys.stderr.buffer}
+    while True:
+        try:
+            header = reader.read(5)
+            size = struct.unpack(">I", header[1:])[0] if len(header) == 5 else -1
+            payload = reader.read(size) if size >= 0 else b""
+        except OSError:
+            size, payload = -1, b""
+        if size < 0 or len(payload) < size:
+            print("Lost connection to worker running %s" % (script,), file=sys.stderr)
+            return 1
+        if header[:1] in streams:
+            streams[header[:1]].write(payload)
+            streams[header[:1]].flush()
+        elif header[:1] == b"X":
+            code = int(payload)
+            return code if code >= 0 else 128 - code  # Killed by a signal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a command-line task script in a warm worker")
+    parser.add_argument("--socket", required=True, help="Path of the server's Unix socket")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Maximum number of workers, if starting the server")
+    parser.add_argument("--idle-timeout", type=float, default=600.0,
+                        help="Idle time after which the server exits, if starting the server (sec)")
+    parser.add_argument("--start-timeout", type=float, default=300.0,
+                        help="Maximum time to wait for the server to start (sec)")
+    parser.add_argument("script", help="Script to run")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the script")
+    args = parser.parse_args()
+
+    sock = None
+    directory = os.path.dirname(os.path.abspath(args.socket))
+    if isPrivate(directory):
+        sock = connect(args.socket) or startServer(args)
+    else:
+        print("Socket directory %s isn't private to this user" % (directory,), file=sys.stderr)
+    if sock is not None:
+        with sock:
+            code = run(sock, args.script, args.args)
+        if code is not None:
+            sys.exit(code)
+    print("Unable to use worker at %s; running %s directly" % (args.socket, args.script), file=sys.stderr)
+    os.execv(sys.executable, [sys.executable, args.script] + args.args)
+
+
+if __name__ == "__main__":
+    main()
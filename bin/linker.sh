@@ -1,7 +1,12 @@
 #!/usr/bin/env sh
-ln -s "$TESTDATA_CI_HSC_DIR"/CALIB .
-ln -s "$TESTDATA_CI_HSC_DIR"/raw .
-ln -s "$TESTDATA_CI_HSC_DIR"/brightObjectMasks .
-ln -s "$TESTDATA_CI_HSC_DIR"/ps1_pv3_3pi_20170110 .
-ln -s "$TESTDATA_CI_HSC_DIR"/gaia_dr2_20200414 .
-ln -s "$TESTDATA_CI_HSC_DIR"/jointcal .
+# Link against the test data. If $CI_HSC_CACHE_DIR is set, the data are first
+# staged into that (node-local) cache, capped at $CI_HSC_CACHE_SIZE GB.
+for name in CALIB raw brightObjectMasks ps1_pv3_3pi_20170110 gaia_dr2_20200414 jointcal; do
+    if [ -n "$CI_HSC_CACHE_DIR" ]; then
+        source=$(bin/stageInputs.py "$CI_HSC_CACHE_DIR" "$TESTDATA_CI_HSC_DIR/$name" \
+                 ${CI_HSC_CACHE_SIZE:+--max-size "$CI_HSC_CACHE_SIZE"}) || exit 1
+    else
+        source="$TESTDATA_CI_HSC_DIR/$name"
+    fi
+    ln -sn "$source" "$name"
+done
@@ -0,0 +1,175 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["TableChecksum", "getKeyColumns", "checksumParquet"]
+
+import numpy
+import pyarrow.parquet
+
+UINT64_MASK = (1 << 64) - 1
+
+
+def _mix(values):
+    """Hash an array of values to well-mixed 64-bit integers
+
+    Floating-point values are canonicalized (``-0.0`` to ``0.0``, and all
+    NaNs to a single NaN) so that the hash depends only on the values.
+    This is the splitmix64 finalizer.
+    """
+    values = numpy.asarray(values)
+    if values.dtype.kind == "f":
+        values = numpy.where(numpy.isnan(values), numpy.nan, values.astype(numpy.float64) + 0.0)
+        bits = values.view(numpy.uint64)
+    elif values.dtype.kind in "iub":
+        bits = values.astype(numpy.int64).view(numpy.uint64)
+    else:
+        raise TypeError("Unable to checksum column of type %s" % (values.dtype,))
+    with numpy.errstate(over="ignore"):
+        bits = (bits ^ (bits >> numpy.uint64(30)))*numpy.uint64(0xbf58476d1ce4e5b9)
+        bits = (bits ^ (bits >> numpy.uint64(27)))*numpy.uint64(0x94d049bb133111eb)
+        return bits ^ (bits >> numpy.uint64(31))
+
+
+class TableChecksum:
+    """Order-independent checksum of key columns in a table
+
+    The checksum is accumulated one chunk of rows at a time, so a table can
+    be checksummed without ever holding more than a chunk in memory, and the
+    checksums of several tables add up to the checksum of their
+    concatenation (in any order).
+
+    Parameters
+    ----------
+    columns : iterable of `str`
+        Names of the columns to checksum.
+    """
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.numRows = 0
+        self.sums = dict.fromkeys(self.columns, 0)
+        self.xors = dict.fromkeys(self.columns, 0)
+
+    def add(self, values, numRows):
+        """Accumulate a chunk of rows
+
+        Parameters
+        ----------
+        values : `dict` [`str`, `numpy.ndarray`]
+            Values of (at least) all of the ``columns`` for the chunk.
+        numRows : `int`
+            Number of rows in the chunk.
+        """
+        self.numRows += numRows
+        for name in self.columns:
+            hashed = _mix(values[name])
+            self.sums[name] = (self.sums[name] + int(hashed.sum(dtype=numpy.uint64))) & UINT64_MASK
+            self.xors[name] ^= int(numpy.bitwise_xor.reduce(hashed)) if len(hashed) > 0 else 0
+
+    def __iadd__(self, other):
+        """Accumulate the checksum of another table"""
+        if other.columns != self.columns:
+            raise ValueError("Column mismatch: %s vs %s" % (other.columns, self.columns))
+        self.numRows += other.numRows
+        for name in self.columns:
+            self.sums[name] = (self.sums[name] + other.sums[name]) & UINT64_MASK
+            self.xors[name] ^= other.xors[name]
+        return self
+
+    def compare(self, other):
+        """Return the names of the columns whose checksums differ"""
+        return [name for name in self.columns if
+                (self.sums[name], self.xors[name]) != (other.sums.get(name), other.xors.get(name))]
+
+
+def _getRangeIndexes(schema):
+    """Return the pandas range indexes that aren't stored as columns
+
+    Returns
+    -------
+    indexes : `dict` [`str`, `dict`]
+        pandas metadata for the range indexes, indexed by name.
+    """
+    metadata = schema.pandas_metadata or {}
+    return {index["name"]: index for index in metadata.get("index_columns", []) if
+            isinstance(index, dict) and index.get("kind") == "range" and index.get("name")}
+
+
+def getKeyColumns(filename, extraColumns=()):
+    """Return the names of the key columns of a Parquet table
+
+    The key columns are the pandas index columns (e.g., ``sourceId`` or
+    ``objectId``), plus any of the ``extraColumns`` that are present.
+    pandas doesn't store an index that's a simple range as a column, but we
+    regenerate those from the metadata.
+
+    Parameters
+    ----------
+    filename : `str`
+        Name of Parquet file.
+    extraColumns : iterable of `str`
+        Names of additional columns to use, if present.
+
+    Returns
+    -------
+    columns : `list` of `str`
+        Names of key columns.
+    """
+    schema = pyarrow.parquet.read_schema(filename)
+    metadata = schema.pandas_metadata or {}
+    columns = [name for name in metadata.get("index_columns", []) if isinstance(name, str)]
+    columns += list(_getRangeIndexes(schema))
+    columns += [name for name in extraColumns if name in schema.names and name not in columns]
+    return columns
+
+
+def checksumParquet(filename, columns):
+    """Checksum key columns of a Parquet table, one row group at a time
+
+    Parameters
+    ----------
+    filename : `str`
+        Name of Parquet file.
+    columns : iterable of `str`
+        Names of the columns to checksum.
+
+    Returns
+    -------
+    checksum : `TableChecksum`
+        Checksum of the table.
+    """
+    checksum = TableChecksum(columns)
+    parquetFile = pyarrow.parquet.ParquetFile(filename)
+    if not checksum.columns:
+        checksum.numRows = parquetFile.metadata.num_rows
+        return checksum
+    rangeIndexes = {name: index for name, index in _getRangeIndexes(parquetFile.schema_arrow).items() if
+                    name in checksum.columns and name not in parquetFile.schema_arrow.names}
+    stored = [name for name in checksum.columns if name not in rangeIndexes]
+    start = 0
+    for ii in range(parquetFile.num_row_groups):
+        table = parquetFile.read_row_group(ii, columns=stored)
+        numRows = parquetFile.metadata.row_group(ii).num_rows
+        values = {name: table.column(name).to_numpy(zero_copy_only=False) for name in stored}
+        for name, index in rangeIndexes.items():
+            values[name] = index["start"] + index["step"]*numpy.arange(start, start + numRows)
+        checksum.add(values, numRows)
+        start += numRows
+    return checksum
@@ -0,0 +1,128 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["CoreBudget", "withCores"]
+
+import os
+import sys
+import time
+import fcntl
+import argparse
+import subprocess
+from contextlib import contextmanager
+
+
+class CoreBudget:
+    """Budget of cores shared between processes
+
+    Each core is represented by a lock file; a process reserves cores by
+    holding locks on that many of the files. The locks are released when the
+    files are closed, including when the process dies, so a crashed job can't
+    leak its reservation.
+
+    Cores are reserved all at once or not at all (a partial reservation is
+    released before waiting), so processes waiting for cores can't deadlock.
+
+    Parameters
+    ----------
+    lockDir : `str`
+        Directory for the lock files; shared by all processes using the
+        budget.
+    numCores : `int`
+        Total number of cores in the budget.
+    """
+    def __init__(self, lockDir, numCores):
+        self.lockDir = lockDir
+        self.numCores = max(1, numCores)
+        os.makedirs(lockDir, exist_ok=True)
+
+    def _tryAcquire(self, num):
+        """Try to lock ``num`` cores, returning the locked files or `None`"""
+        held = []
+        for ii in range(self.numCores):
+            fd = open(os.path.join(self.lockDir, "core-%03d" % (ii,)), "a")
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                fd.close()
+                continue
+            held.append(fd)
+            if len(held) == num:
+                return held
+        for fd in held:
+            fd.close()
+        return None
+
+    @contextmanager
+    def reserve(self, num, timeout=None, poll=0.5):
+        """Reserve cores for the duration of the context
+
+        Parameters
+        ----------
+        num : `int`
+            Number of cores to reserve; limited to the size of the budget.
+        timeout : `float`, optional
+            Maximum time to wait for the cores (sec); by default, wait
+            indefinitely.
+        poll : `float`
+            Interval between attempts to reserve the cores (sec).
+
+        Yields
+        ------
+        num : `int`
+            Number of cores reserved.
+
+        Raises
+        ------
+        TimeoutError
+            If the cores couldn't be reserved within the ``timeout``.
+        """
+        num = min(max(1, num), self.numCores)
+        start = time.monotonic()
+        while True:
+            held = self._tryAcquire(num)
+            if held is not None:
+                break
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError("Unable to reserve %d of %d cores within %f sec" %
+                                   (num, self.numCores, timeout))
+            time.sleep(poll)
+        try:
+            yield num
+        finally:
+            for fd in held:
+                fd.close()
+
+
+def withCores():
+    """Command-line interface for running a command on reserved cores
+
+    The exit status is that of the command.
+    """
+    parser = argparse.ArgumentParser(description="Run a command once cores are available in a budget")
+    parser.add_argument("command", help="Command to run (in the shell)")
+    parser.add_argument("--cores", type=int, required=True, help="Number of cores for the command")
+    parser.add_argument("--budget", type=int, required=True, help="Total number of cores in the budget")
+    parser.add_argument("--lock-dir", required=True, help="Directory of lock files for the budget")
+    args = parser.parse_args()
+
+    with CoreBudget(args.lock_dir, args.budget).reserve(args.cores):
+        sys.exit(subprocess.call(args.command, shell=True))
@@ -0,0 +1,142 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["ARCSEC", "RefCatIndex", "MatchStatistics"]
+
+import os
+import re
+
+import numpy
+from scipy.spatial import cKDTree
+
+from lsst.pipe.base import Struct
+from lsst.afw.table import SimpleCatalog
+
+ARCSEC = numpy.pi/180/3600  # One arcsecond in radians
+
+
+def _toUnitVectors(ra, dec):
+    """Convert RA, Dec (radians) to an array of unit vectors"""
+    cosDec = numpy.cos(dec)
+    return numpy.stack([cosDec*numpy.cos(ra), cosDec*numpy.sin(ra), numpy.sin(dec)], axis=-1)
+
+
+class MatchStatistics(Struct):
+    """Results of a cross-match
+
+    Attributes
+    ----------
+    numSources : `int`
+        Number of sources that were matched.
+    numMatches : `int`
+        Number of sources with a reference object within the match radius.
+    sourceIndex, refIndex : `numpy.ndarray` of `int`
+        Indices of the matched sources and reference objects.
+    separation : `numpy.ndarray` of `float`
+        Separation of each match (radians).
+    medianSeparation, rmsSeparation : `float`
+        Median and RMS of the separations (arcsec).
+    """
+    def __init__(self, numSources, sourceIndex, refIndex, separation):
+        arcsec = separation/ARCSEC
+        Struct.__init__(self, numSources=numSources, numMatches=len(sourceIndex),
+                        sourceIndex=sourceIndex, refIndex=refIndex, separation=separation,
+                        medianSeparation=float(numpy.median(arcsec)) if len(arcsec) else numpy.nan,
+                        rmsSeparation=float(numpy.sqrt(numpy.mean(arcsec**2))) if len(arcsec) else numpy.nan)
+
+
+class RefCatIndex:
+    """Spatial index of a reference catalog, for fast cross-matching
+
+    The reference objects are converted to unit vectors and placed in a
+    KD-tree, so that matching a catalog is a single bulk query, without
+    going through the reference object loader task machinery.
+
+    Parameters
+    ----------
+    ra, dec : `numpy.ndarray` of `float`
+        Coordinates of the reference objects (radians).
+    """
+    _cache = {}  # Indices that have been read, by directory
+
+    def __init__(self, ra, dec):
+        self.ra = numpy.asarray(ra, dtype=float)
+        self.dec = numpy.asarray(dec, dtype=float)
+        self.tree = cKDTree(_toUnitVectors(self.ra, self.dec))
+
+    def __len__(self):
+        return len(self.ra)
+
+    @classmethod
+    def fromDirectory(cls, path):
+        """Construct from the shards of an HTM-indexed reference catalog
+
+        All the shards in the directory are read, and the result is cached
+        so that the shards are only read once per process.
+
+        Parameters
+        ----------
+        path : `str`
+            Directory containing the reference catalog shards (files named
+            ``<htmId>.fits``).
+
+        Returns
+        -------
+        self : `RefCatIndex`
+            Spatial index of the reference catalog.
+        """
+        path = os.path.realpath(path)
+        if path not in cls._cache:
+            shards = [SimpleCatalog.readFits(os.path.join(path, filename)) for
+                      filename in sorted(os.listdir(path)) if re.match(r"^\d+\.fits$", filename)]
+            ra = numpy.concatenate([numpy.asarray(shard["coord_ra"]) for shard in shards] + [[]])
+            dec = numpy.concatenate([numpy.asarray(shard["coord_dec"]) for shard in shards] + [[]])
+            cls._cache[path] = cls(ra, dec)
+        return cls._cache[path]
+
+    def match(self, ra, dec, radius=1.0*ARCSEC):
+        """Match coordinates to the nearest reference object
+
+        Parameters
+        ----------
+        ra, dec : `numpy.ndarray` of `float`
+            Coordinates to match (radians).
+        radius : `float`
+            Maximum separation for a match (radians).
+
+        Returns
+        -------
+        stats : `MatchStatistics`
+            Matches and statistics of the separations.
+        """
+        ra = numpy.asarray(ra, dtype=float)
+        dec = numpy.asarray(dec, dtype=float)
+        good = numpy.isfinite(ra) & numpy.isfinite(dec)
+        if len(self) == 0 or not good.any():
+            empty = numpy.array([], dtype=int)
+            return MatchStatistics(int(good.sum()), empty, empty, numpy.array([], dtype=float))
+        chord = 2*numpy.sin(0.5*radius)
+        distance, refIndex = self.tree.query(_toUnitVectors(ra[good], dec[good]), k=1,
+                                             distance_upper_bound=chord)
+        matched = numpy.isfinite(distance)
+        separation = 2*numpy.arcsin(0.5*distance[matched])
+        return MatchStatistics(int(good.sum()), numpy.flatnonzero(good)[matched], refIndex[matched],
+                               separation)
@@ -0,0 +1,420 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["translateDataId", "compareArrays", "compareExposures", "compareCatalogs", "compareDataFrames",
+           "findPairs", "checkEquivalence"]
+
+import sys
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+import lsst.geom
+from lsst.daf.persistence import Butler as Butler2
+from lsst.daf.butler import Butler as Butler3
+
+CHUNK_ROWS = 512  # Number of image rows to compare at a time
+
+
+def translateDataId(dataId3, skyMap=None, bandFilters=None):
+    """Translate a Gen3 data identifier to Gen2
+
+    Parameters
+    ----------
+    dataId3 : `dict`
+        Gen3 data identifier.
+    skyMap : `lsst.skymap.BaseSkyMap`, optional
+        Sky map, for translating patch identifiers.
+    bandFilters : `dict` [`str`, `list` of `str`], optional
+        Physical filters for each band, for translating the ``band``
+        dimension (which has no Gen2 equivalent) to ``filter``.
+
+    Returns
+    -------
+    candidates : `list` of `dict`
+        Possible Gen2 data identifiers: a band may correspond to more than
+        one physical filter, so we can't tell which without looking.
+    """
+    dataId2 = {}
+    for key, value in dataId3.items():
+        if key in ("exposure", "visit"):
+            dataId2["visit"] = value
+        elif key == "detector":
+            dataId2["ccd"] = value
+        elif key == "physical_filter":
+            dataId2["filter"] = value
+        elif key == "patch":
+            if skyMap is None:
+                raise RuntimeError("Unable to translate patch without a sky map")
+            numPatchesX = skyMap[dataId3["tract"]].getNumPatches()[0]
+            dataId2["patch"] = "%d,%d" % (value % numPatchesX, value // numPatchesX)
+        elif key not in ("instrument", "skymap", "band"):
+            dataId2[key] = value
+    if "band" in dataId3 and "physical_filter" not in dataId3:
+        return [dict(dataId2, filter=ff) for ff in (bandFilters or {}).get(dataId3["band"], [])]
+    return [dataId2]
+
+
+def compareArrays(array2, array3):
+    """Count the elements that differ between two arrays
+
+    NaNs compare equal to each other.
+
+    Returns
+    -------
+    numDifferent : `int`
+        Number of elements that differ, or the size of the larger array if
+        the shapes differ.
+    """
+    array2 = numpy.asarray(array2)
+    array3 = numpy.asarray(array3)
+    if array2.shape != array3.shape:
+        return max(array2.size, array3.size)
+    if array2.dtype.kind in "fc" and array3.dtype.kind in "fc":
+        different = ~((array2 == array3) | (numpy.isnan(array2) & numpy.isnan(array3)))
+    else:
+        different = array2 != array3
+    return int(numpy.count_nonzero(different))
+
+
+def _cleanMetadata(metadata):
+    """Convert metadata to a `dict`, without the provenance of header fixes,
+    which differs between reads
+    """
+    return {key: value for key, value in metadata.toDict().items() if "ASTRO METADATA" not in key}
+
+
+def _compareExposureInfo(exp2, exp3):
+    """Compare the metadata, WCS and visit information of two exposures
+
+    Gen2 isn't careful about stripping metadata the same way in different
+    code paths, so we only check that the keys in common have the same
+    values.
+    """
+    mismatches = []
+    md2 = _cleanMetadata(exp2.getMetadata())
+    md3 = _cleanMetadata(exp3.getMetadata())
+    different = sorted(key for key in md2.keys() & md3.keys() if md2[key] != md3[key])
+    if different:
+        mismatches.append(("metadata", "values differ for %s" % (", ".join(different),)))
+    if exp2.getWcs() != exp3.getWcs():
+        mismatches.append(("wcs", "%s vs %s" % (exp2.getWcs(), exp3.getWcs())))
+    # Compare strings, because NaNs make VisitInfos unequal
+    if str(exp2.getInfo().getVisitInfo()) != str(exp3.getInfo().getVisitInfo()):
+        mismatches.append(("visitInfo", "visit information differs"))
+    return mismatches
+
+
+def compareExposures(butler2, butler3, dataset, dataId2, dataId3, chunkRows=CHUNK_ROWS):
+    """Compare an exposure from Gen2 and Gen3 butlers
+
+    The pixels are read and compared a chunk of rows at a time, to cap the
+    memory used. If the bounding box or the first sub-image can't be read
+    (not all exposure-like datasets support reading sub-images), the whole
+    exposure is read and compared in memory instead.
+
+    Parameters
+    ----------
+    butler2 : `lsst.daf.persistence.Butler`
+        Gen2 butler.
+    butler3 : `lsst.daf.butler.Butler`
+        Gen3 butler, with default collections set.
+    dataset : `str`
+        Name of dataset.
+    dataId2, dataId3 : `dict`
+        Gen2 and Gen3 data identifiers.
+    chunkRows : `int`
+        Number of rows to compare at a time.
+
+    Returns
+    -------
+    mismatches : `list` of `tuple`
+        Kind and description of each mismatch.
+    """
+    try:
+        bbox = butler2.get(dataset + "_bbox", dataId2)
+        bbox3 = butler3.get(dataset + ".bbox", dataId3)
+        if bbox != bbox3:
+            return [("bbox", "%s vs %s" % (bbox, bbox3))]
+        chunks = [lsst.geom.Box2I(lsst.geom.Point2I(bbox.getMinX(), yy),
+                                  lsst.geom.Extent2I(bbox.getWidth(), min(chunkRows, bbox.getEndY() - yy)))
+                  for yy in range(bbox.getMinY(), bbox.getEndY(), chunkRows)]
+    except Exception:
+        chunks = [None]
+
+    def read(box):
+        """Read the exposures, or the sub-images within a box"""
+        if box is None:
+            return butler2.get(dataset, dataId2), butler3.get(dataset, dataId3)
+        return (butler2.get(dataset + "_sub", dataId2, bbox=box, imageOrigin="PARENT"),
+                butler3.get(dataset, dataId3, parameters={"bbox": box}))
+
+    try:
+        exp2, exp3 = read(chunks[0])
+    except Exception:
+        if chunks[0] is None:
+            raise
+        chunks = [None]
+        exp2, exp3 = read(None)
+
+    mismatches = []
+    numDifferent = Counter()
+    for ii, box in enumerate(chunks):
+        if ii > 0:
+            exp2, exp3 = read(box)
+        else:
+            mismatches += _compareExposureInfo(exp2, exp3)
+        for plane in ("image", "mask", "variance"):
+            numDifferent[plane] += compareArrays(getattr(exp2.maskedImage, plane).array,
+                                                 getattr(exp3.maskedImage, plane).array)
+        del exp2, exp3
+    mismatches += [(plane, "%d pixels differ" % (num,)) for plane, num in numDifferent.items() if num > 0]
+    return mismatches
+
+
+def compareCatalogs(cat2, cat3):
+    """Compare two afw catalogs column by column
+
+    Parameters
+    ----------
+    cat2, cat3 : `lsst.afw.table.BaseCatalog`
+        Gen2 and Gen3 catalogs.
+
+    Returns
+    -------
+    mismatches : `list` of `tuple`
+        Kind and description of each mismatch.
+    """
+    if len(cat2) != len(cat3):
+        return [("rows", "%d vs %d" % (len(cat2), len(cat3)))]
+    mismatches = []
+    names2 = set(cat2.schema.getNames())
+    names3 = set(cat3.schema.getNames())
+    if names2 != names3:
+        mismatches.append(("columns", "only in Gen2: %s; only in Gen3: %s" %
+                           (sorted(names2 - names3), sorted(names3 - names2))))
+    if not cat2.isContiguous():
+        cat2 = cat2.copy(deep=True)
+    if not cat3.isContiguous():
+        cat3 = cat3.copy(deep=True)
+    different = []
+    for name in sorted(names2 & names3):
+        try:
+            column2 = cat2.get(name)
+            column3 = cat3.get(name)
+        except Exception:
+            continue  # Not all field types support columnar access
+        num = compareArrays(column2, column3)
+        if num > 0:
+            different.append("%s (%d rows)" % (name, num))
+    if different:
+        mismatches.append(("values", ", ".join(different)))
+    return mismatches
+
+
+def compareDataFrames(df2, df3):
+    """Compare two `pandas.DataFrame` column by column
+
+    Parameters
+    ----------
+    df2, df3 : `pandas.DataFrame` or `~lsst.pipe.tasks.ParquetTable`
+        Gen2 and Gen3 tables.
+
+    Returns
+    -------
+    mismatches : `list` of `tuple`
+        Kind and description of each mismatch.
+    """
+    # Gen2 provides a ParquetTable, while Gen3 provides a DataFrame
+    if hasattr(df2, "toDataFrame"):
+        df2 = df2.toDataFrame()
+    if hasattr(df3, "toDataFrame"):
+        df3 = df3.toDataFrame()
+    if len(df2) != len(df3):
+        return [("rows", "%d vs %d" % (len(df2), len(df3)))]
+    mismatches = []
+    if compareArrays(df2.index.to_numpy(), df3.index.to_numpy()) > 0:
+        mismatches.append(("index", "index values differ"))
+    columns2 = set(df2.columns)
+    columns3 = set(df3.columns)
+    if columns2 != columns3:
+        mismatches.append(("columns", "only in Gen2: %s; only in Gen3: %s" %
+                           (sorted(map(str, columns2 - columns3)), sorted(map(str, columns3 - columns2)))))
+    different = []
+    for name in sorted(columns2 & columns3, key=str):
+        num = compareArrays(df2[name].to_numpy(), df3[name].to_numpy())
+        if num > 0:
+            different.append("%s (%d rows)" % (name, num))
+    if different:
+        mismatches.append(("values", ", ".join(different)))
+    return mismatches
+
+
+def _getKind(storageClassName):
+    """Return how to compare datasets of a storage class, or `None`"""
+    if storageClassName == "DataFrame":
+        return "dataFrame"
+    if storageClassName.endswith("Catalog"):
+        return "catalog"
+    if storageClassName.startswith("Exposure"):
+        return "exposure"
+    return None
+
+
+def findPairs(butler2, butler3, collections, datasets=None):
+    """Find the datasets to compare
+
+    Parameters
+    ----------
+    butler2 : `lsst.daf.persistence.Butler`
+        Gen2 butler.
+    butler3 : `lsst.daf.butler.Butler`
+        Gen3 butler.
+    collections : `list` of `str`
+        Gen3 collections to search.
+    datasets : iterable of `str`, optional
+        Names of datasets to compare; by default, all that we know how to
+        compare.
+
+    Returns
+    -------
+    pairs : `list` of `tuple`
+        Dataset name, kind (``exposure``, ``catalog`` or ``dataFrame``), Gen3
+        data identifier and candidate Gen2 data identifiers for each dataset.
+    skipped : `dict` [`str`, `str`]
+        Reason that datasets of each type weren't compared, for those that
+        can't be.
+    """
+    try:
+        skyMap = butler2.get("deepCoadd_skyMap")
+    except Exception:
+        skyMap = None
+    bandFilters = {}
+    for record in butler3.registry.queryDimensionRecords("physical_filter"):
+        bandFilters.setdefault(record.band, []).append(record.name)
+
+    pairs = []
+    skipped = {}
+    seen = set()
+    for datasetType in butler3.registry.queryDatasetTypes():
+        if datasetType.isComponent() or (datasets and datasetType.name not in datasets):
+            continue
+        kind = _getKind(datasetType.storageClass.name)
+        try:
+            refs = list(butler3.registry.queryDatasets(datasetType, collections=collections))
+        except Exception as exc:
+            # e.g., calibrations, which can't be queried this way
+            skipped[datasetType.name] = "unable to query: %s: %s" % (type(exc).__name__, exc)
+            continue
+        if kind is None and refs:
+            skipped[datasetType.name] = "storage class %s isn't supported" % (datasetType.storageClass.name,)
+            continue
+        for ref in refs:
+            dataId3 = dict(ref.dataId.byName())
+            key = (datasetType.name, tuple(sorted(dataId3.items())))
+            if key in seen:
+                continue
+            seen.add(key)
+            pairs.append((datasetType.name, kind, dataId3, translateDataId(dataId3, skyMap, bandFilters)))
+    return pairs, skipped
+
+
+_butlers = None  # Gen2 and Gen3 butlers for a worker process
+
+
+def _initWorker(gen2root, gen3root, collections):
+    """Create the butlers for a worker process"""
+    global _butlers
+    _butlers = (Butler2(gen2root), Butler3(gen3root, collections=collections))
+
+
+def _comparePair(pair, chunkRows=CHUNK_ROWS):
+    """Compare a dataset in the Gen2 and Gen3 repositories
+
+    Returns
+    -------
+    dataset : `str`
+        Name of dataset.
+    dataId3 : `dict`
+        Gen3 data identifier.
+    mismatches : `list` of `tuple`
+        Kind and description of each mismatch.
+    """
+    dataset, kind, dataId3, candidates = pair
+    butler2, butler3 = _butlers
+    try:
+        dataId2 = next((dataId for dataId in candidates if butler2.datasetExists(dataset, dataId)), None)
+        if dataId2 is None:
+            return dataset, dataId3, [("missing", "not found in Gen2 (tried %s)" % (candidates,))]
+        if kind == "exposure":
+            return dataset, dataId3, compareExposures(butler2, butler3, dataset, dataId2, dataId3, chunkRows)
+        compare = compareCatalogs if kind == "catalog" else compareDataFrames
+        return dataset, dataId3, compare(butler2.get(dataset, dataId2), butler3.get(dataset, dataId3))
+    except Exception as exc:
+        return dataset, dataId3, [("error", "%s: %s" % (type(exc).__name__, exc))]
+
+
+def checkEquivalence():
+    """Command-line interface for comparing Gen2 and Gen3 repositories
+
+    Each dataset in the Gen3 repository is paired with its Gen2 counterpart
+    and compared, in parallel across processes. The exit status is non-zero
+    if any pair differs.
+    """
+    parser = argparse.ArgumentParser(description="Compare the datasets in Gen2 and Gen3 repositories")
+    parser.add_argument("gen2root", help="Gen2 data root (e.g., the rerun)")
+    parser.add_argument("gen3root", help="Gen3 data root")
+    parser.add_argument("--collections", nargs="+", default=["HSC/runs/ci_hsc"], help="Gen3 collections")
+    parser.add_argument("--dataset", nargs="+", default=None, help="Datasets to compare (default: all)")
+    parser.add_argument("-j", "--processes", type=int, default=4, help="Number of processes")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help="Number of image rows to compare at a time")
+    parser.add_argument("--max-report", type=int, default=50, help="Maximum number of mismatches to list")
+    args = parser.parse_args()
+
+    pairs, skipped = findPairs(Butler2(args.gen2root), Butler3(args.gen3root), args.collections, args.dataset)
+    compared = Counter()
+    failed = Counter()
+    numReported = 0
+    context = multiprocessing.get_context("spawn")  # The butlers aren't fork-safe
+    with ProcessPoolExecutor(max_workers=max(1, args.processes), mp_context=context, initializer=_initWorker,
+                             initargs=(args.gen2root, args.gen3root, args.collections)) as executor:
+        results = executor.map(_comparePair, pairs, [args.chunk_rows]*len(pairs), chunksize=4)
+        for dataset, dataId3, mismatches in results:
+            compared[dataset] += 1
+            if not mismatches:
+                continue
+            failed[dataset] += 1
+            for kind, description in mismatches:
+                if numReported < args.max_report:
+                    print("%s %s: %s: %s" % (dataset, dataId3, kind, description))
+                numReported += 1
+
+    print("%-40s %10s %10s" % ("Dataset", "Compared", "Mismatched"))
+    for dataset in sorted(compared):
+        print("%-40s %10d %10d" % (dataset, compared[dataset], failed[dataset]))
+    for dataset, reason in sorted(skipped.items()):
+        print("Not compared: %s: %s" % (dataset, reason))
+    print("%d datasets compared; %d mismatched" % (sum(compared.values()), sum(failed.values())))
+    sys.exit(1 if failed else 0)
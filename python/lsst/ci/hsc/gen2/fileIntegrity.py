@@ -0,0 +1,240 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["FitsStructureError", "iterHdus", "checkFitsStructure", "statFiles", "checkFiles"]
+
+import os
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+
+FITS_BLOCK_SIZE = 2880  # Size of a FITS header or data block (bytes)
+FITS_CARD_SIZE = 80  # Size of a FITS header card (bytes)
+STRUCTURAL_KEYWORDS = ("SIMPLE", "XTENSION", "BITPIX", "NAXIS", "PCOUNT", "GCOUNT")
+
+
+class FitsStructureError(RuntimeError):
+    """A FITS file is truncated or its structure is inconsistent"""
+    pass
+
+
+def _readHeader(buffer, start):
+    """Read the structural keywords from a FITS header
+
+    Parameters
+    ----------
+    buffer : `mmap.mmap`
+        Memory-mapped file contents.
+    start : `int`
+        Offset of the start of the header.
+
+    Returns
+    -------
+    cards : `dict` [`str`, `str`]
+        Values of the structural keywords, as unparsed strings.
+    end : `int`
+        Offset of the first byte after the header.
+    """
+    cards = {}
+    offset = start
+    size = len(buffer)
+    while True:
+        if offset + FITS_BLOCK_SIZE > size:
+            raise FitsStructureError("Header starting at byte %d is truncated" % (start,))
+        block = buffer[offset:offset + FITS_BLOCK_SIZE]
+        offset += FITS_BLOCK_SIZE
+        for ii in range(0, FITS_BLOCK_SIZE, FITS_CARD_SIZE):
+            keyword = block[ii:ii + 8].rstrip().decode("ascii", "replace")
+            if keyword == "END":
+                return cards, offset
+            if block[ii + 8:ii + 10] != b"= ":
+                continue
+            if keyword in STRUCTURAL_KEYWORDS or keyword.startswith("NAXIS"):
+                value = block[ii + 10:ii + FITS_CARD_SIZE].split(b"/", 1)[0]
+                cards[keyword] = value.strip().strip(b"'").strip().decode("ascii", "replace")
+
+
+def _getDataSize(cards, hduNum):
+    """Return the padded size of the data unit described by a header
+
+    Parameters
+    ----------
+    cards : `dict` [`str`, `str`]
+        Values of the structural keywords, from `_readHeader`.
+    hduNum : `int`
+        Index of the HDU, for error messages.
+
+    Returns
+    -------
+    size : `int`
+        Size of the data unit (bytes), including padding to a whole block.
+    """
+    try:
+        bitpix = int(cards["BITPIX"])
+        naxis = int(cards["NAXIS"])
+        shape = [int(cards["NAXIS%d" % (ii + 1)]) for ii in range(naxis)]
+        pcount = int(cards.get("PCOUNT", 0))
+        gcount = int(cards.get("GCOUNT", 1))
+    except (KeyError, ValueError) as exc:
+        raise FitsStructureError("HDU %d has a bad structural keyword: %s" % (hduNum, exc)) from exc
+    if naxis == 0:
+        return 0
+    numElements = 1
+    for length in shape:
+        numElements *= length
+    size = abs(bitpix)//8*gcount*(pcount + numElements)
+    return FITS_BLOCK_SIZE*((size + FITS_BLOCK_SIZE - 1)//FITS_BLOCK_SIZE)
+
+
+def iterHdus(buffer):
+    """Iterate over the HDUs in a FITS file
+
+    Only the header blocks are read: the data units are skipped over using
+    the sizes implied by the structural keywords.
+
+    Parameters
+    ----------
+    buffer : `mmap.mmap`
+        Memory-mapped file contents.
+
+    Yields
+    ------
+    headerStart : `int`
+        Offset of the start of the header.
+    dataStart : `int`
+        Offset of the start of the data unit (i.e., the end of the header).
+    cards : `dict` [`str`, `str`]
+        Values of the structural keywords, as unparsed strings.
+
+    Raises
+    ------
+    FitsStructureError
+        If the file is truncated or has a bad header.
+    """
+    size = len(buffer)
+    offset = 0
+    hduNum = 0
+    while offset < size:
+        cards, dataStart = _readHeader(buffer, offset)
+        expected = "SIMPLE" if hduNum == 0 else "XTENSION"
+        if expected not in cards:
+            raise FitsStructureError("HDU %d has no %s keyword" % (hduNum, expected))
+        yield offset, dataStart, cards
+        offset = dataStart + _getDataSize(cards, hduNum)
+        if offset > size:
+            raise FitsStructureError("Data for HDU %d is truncated (expected %d bytes, found %d)" %
+                                     (hduNum, offset, size))
+        hduNum += 1
+
+
+def checkFitsStructure(filename):
+    """Check that the structure of a FITS file is consistent with its size
+
+    The file is memory-mapped, and only the header blocks are read (see
+    `iterHdus`): the data units are skipped over using the sizes implied by
+    the ``BITPIX``, ``NAXISn``, ``PCOUNT`` and ``GCOUNT`` keywords. This is
+    enough to catch files that were truncated by a killed job, without
+    reading the pixels.
+
+    Parameters
+    ----------
+    filename : `str`
+        Name of FITS file to check.
+
+    Returns
+    -------
+    numHdus : `int`
+        Number of HDUs in the file.
+
+    Raises
+    ------
+    FitsStructureError
+        If the file is truncated, has trailing bytes, or has a bad header.
+    """
+    with open(filename, "rb") as fd:
+        size = os.fstat(fd.fileno()).st_size
+        if size == 0:
+            raise FitsStructureError("File is empty")
+        if size % FITS_BLOCK_SIZE != 0:
+            raise FitsStructureError("File size %d is not a multiple of %d" % (size, FITS_BLOCK_SIZE))
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return sum(1 for _ in iterHdus(buffer))
+
+
+def _getSize(filename):
+    """Return the size of a file, or `None` if it does not exist"""
+    try:
+        return os.stat(filename).st_size
+    except FileNotFoundError:
+        return None
+
+
+def statFiles(filenames, numThreads=8):
+    """Return the sizes of many files, stat-ing them concurrently
+
+    On a network filesystem the latency of each ``stat`` dominates, so
+    issuing them in parallel is much faster than doing them in turn.
+
+    Parameters
+    ----------
+    filenames : iterable of `str`
+        Names of files to stat.
+    numThreads : `int`
+        Number of threads to use.
+
+    Returns
+    -------
+    sizes : `list` of `int` or `None`
+        Size of each file, or `None` if the file does not exist.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, numThreads)) as executor:
+        return list(executor.map(_getSize, filenames))
+
+
+def _checkFile(filename):
+    """Check the structure of a file, returning an error message or `None`"""
+    if not filename.endswith(".fits"):
+        return None
+    try:
+        checkFitsStructure(filename)
+    except (FitsStructureError, OSError) as exc:
+        return str(exc)
+    return None
+
+
+def checkFiles(filenames, numThreads=8):
+    """Check the structure of many FITS files concurrently
+
+    Files that do not have a ``.fits`` extension are not checked.
+
+    Parameters
+    ----------
+    filenames : iterable of `str`
+        Names of files to check.
+    numThreads : `int`
+        Number of threads to use.
+
+    Returns
+    -------
+    errors : `list` of `str` or `None`
+        Description of the problem with each file, or `None` if it is good.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, numThreads)) as executor:
+        return list(executor.map(_checkFile, filenames))
@@ -2,6 +2,8 @@ import os
 import argparse
 from lsst.daf.persistence import Butler
 
+from .registrySnapshot import useRegistrySnapshots
+
 
 def linkFile(source, butler, datasetType, dataId):
     """Link a file in the butler to some source outside
@@ -60,7 +62,11 @@ def installExternalData():
     parser.add_argument("--tract", type=int, default=0, help="Tract identifier")
     parser.add_argument("--visitCcd", nargs=2, type=int, default=[], action="append",
                         help="Visit and CCD of jointcal data to ingest (multiple OK)")
+    parser.add_argument("--registry-snapshot", dest="registrySnapshot", default=False, action="store_true",
+                        help="Serve registry lookups from an in-memory snapshot of the registry")
     args = parser.parse_args()
 
+    if args.registrySnapshot:
+        useRegistrySnapshots()
     butler = Butler(args.root)
     installJointcal(args.source, butler, args.tract, args.visitCcd)
@@ -0,0 +1,288 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["hashFile", "summarizeFile", "buildManifest", "writeManifest", "readManifest",
+           "compareManifests", "makeManifest", "diffManifests"]
+
+import os
+import sys
+import json
+import math
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+CHUNK_SIZE = 1 << 22  # Size of chunks to read when hashing (bytes)
+
+
+def _makeHasher():
+    """Return a fast non-cryptographic hash object
+
+    We use xxhash if it's available, falling back to a short blake2b digest
+    (which is still fast, and is always available).
+    """
+    if xxhash is not None:
+        return xxhash.xxh3_64()
+    return hashlib.blake2b(digest_size=8)
+
+
+def hashFile(filename, chunkSize=CHUNK_SIZE):
+    """Compute a fast content hash of a file
+
+    The file is streamed through the hash in chunks, so memory use is bounded
+    regardless of the size of the file.
+
+    Parameters
+    ----------
+    filename : `str`
+        Name of file to hash.
+    chunkSize : `int`
+        Size of chunks to read (bytes).
+
+    Returns
+    -------
+    digest : `str`
+        Hexadecimal digest of the file contents.
+    """
+    hasher = _makeHasher()
+    with open(filename, "rb") as fd:
+        for chunk in iter(lambda: fd.read(chunkSize), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _summarizeColumns(columns):
+    """Summarize numeric columns
+
+    Parameters
+    ----------
+    columns : iterable of (`str`, `numpy.ndarray`)
+        Column names and values.
+
+    Returns
+    -------
+    means : `dict` [`str`, `float`]
+        Mean of the finite values in each one-dimensional numeric column.
+    """
+    means = {}
+    for name, values in columns:
+        values = numpy.asarray(values)
+        if values.ndim != 1 or values.dtype.kind not in "iuf":
+            continue
+        values = values[numpy.isfinite(values)] if values.dtype.kind == "f" else values
+        means[name] = float(values.mean()) if len(values) > 0 else None
+    return means
+
+
+def _summarizeFits(filename):
+    """Summarize the binary tables in a FITS file
+
+    Image HDUs (including tile-compressed images) are not summarized. Tables
+    in different HDUs may have columns with the same name, so the column
+    means are keyed by ``<hdu>:<column>``.
+    """
+    from astropy.io import fits
+    rows = 0
+    means = {}
+    with fits.open(filename, memmap=True) as hduList:
+        for hduIndex, hdu in enumerate(hduList):
+            if not isinstance(hdu, fits.BinTableHDU) or hdu.header.get("ZIMAGE", False):
+                continue
+            rows += hdu.header["NAXIS2"]
+            if hdu.header["NAXIS2"] > 0:
+                columns = _summarizeColumns((name, hdu.data[name]) for name in hdu.columns.names)
+                means.update(("%d:%s" % (hduIndex, name), value) for name, value in columns.items())
+    return rows, means
+
+
+def _summarizeParquet(filename):
+    """Summarize a Parquet table, reading one row group at a time"""
+    import pyarrow.parquet
+    parquetFile = pyarrow.parquet.ParquetFile(filename)
+    sums = {}
+    counts = {}
+    for ii in range(parquetFile.num_row_groups):
+        table = parquetFile.read_row_group(ii)
+        for name, column in zip(table.column_names, table.columns):
+            values = numpy.asarray(column.to_numpy(zero_copy_only=False))
+            if values.ndim != 1 or values.dtype.kind not in "iuf":
+                continue
+            values = values[numpy.isfinite(values)] if values.dtype.kind == "f" else values
+            sums[name] = sums.get(name, 0.0) + float(values.sum(dtype=numpy.float64))
+            counts[name] = counts.get(name, 0) + len(values)
+    means = {name: sums[name]/counts[name] if counts[name] > 0 else None for name in sums}
+    return parquetFile.metadata.num_rows, means
+
+
+def summarizeFile(filename):
+    """Compute the manifest entry for a single file
+
+    Parameters
+    ----------
+    filename : `str`
+        Name of file to summarize.
+
+    Returns
+    -------
+    entry : `dict`
+        Manifest entry, with ``size`` and ``hash`` for all files, and
+        ``rows`` and ``means`` (column means) for catalogs. For FITS files,
+        the columns are named ``<hdu>:<column>``.
+    """
+    entry = dict(size=os.stat(filename).st_size, hash=hashFile(filename))
+    if filename.endswith(".fits"):
+        rows, means = _summarizeFits(filename)
+        if means:
+            entry.update(rows=rows, means=means)
+    elif filename.endswith((".parq", ".parquet")):
+        entry["rows"], entry["means"] = _summarizeParquet(filename)
+    return entry
+
+
+def buildManifest(root, numThreads=8):
+    """Build a manifest of all files in a data repository
+
+    Parameters
+    ----------
+    root : `str`
+        Root directory of the data repository.
+    numThreads : `int`
+        Number of threads to use for hashing and summarizing files.
+
+    Returns
+    -------
+    manifest : `dict` [`str`, `dict`]
+        Manifest entries (see `summarizeFile`), indexed by filename relative
+        to ``root``.
+    """
+    filenames = sorted(os.path.relpath(os.path.join(dirName, ff), root) for
+                       dirName, _, fileList in os.walk(root) for ff in fileList)
+    with ThreadPoolExecutor(max_workers=max(1, numThreads)) as executor:
+        entries = executor.map(summarizeFile, (os.path.join(root, ff) for ff in filenames))
+        return dict(zip(filenames, entries))
+
+
+def writeManifest(manifest, filename):
+    """Write a manifest to a JSON file"""
+    with open(filename, "w") as fd:
+        json.dump(manifest, fd, indent=1, sort_keys=True)
+
+
+def readManifest(filename):
+    """Read a manifest from a JSON file"""
+    with open(filename) as fd:
+        return json.load(fd)
+
+
+def _isClose(value1, value2, rtol, atol):
+    """Are two (possibly `None`) summary values consistent?"""
+    if value1 is None or value2 is None:
+        return value1 is None and value2 is None
+    return math.isclose(value1, value2, rel_tol=rtol, abs_tol=atol)
+
+
+def compareManifests(manifest1, manifest2, rtol=1.0e-6, atol=0.0):
+    """Compare two manifests
+
+    Parameters
+    ----------
+    manifest1, manifest2 : `dict` [`str`, `dict`]
+        Manifests to compare (see `buildManifest`).
+    rtol, atol : `float`
+        Relative and absolute tolerance for comparing column means.
+
+    Returns
+    -------
+    differences : `list` of (`str`, `str`, `str`)
+        Filename, kind of difference and description for each difference.
+        The kinds are ``missing`` and ``extra`` (file only in the first or
+        second manifest), ``rows``, ``columns`` and ``means`` (catalog
+        summaries differ) and ``content`` (only the size or hash differs,
+        which is expected for files that record timestamps or provenance).
+    """
+    differences = []
+    for filename in sorted(set(manifest1) | set(manifest2)):
+        if filename not in manifest2:
+            differences.append((filename, "missing", "not present in second manifest"))
+            continue
+        if filename not in manifest1:
+            differences.append((filename, "extra", "not present in first manifest"))
+            continue
+        entry1 = manifest1[filename]
+        entry2 = manifest2[filename]
+        if entry1.get("rows") != entry2.get("rows"):
+            differences.append((filename, "rows", "%s != %s" % (entry1.get("rows"), entry2.get("rows"))))
+        means1 = entry1.get("means", {})
+        means2 = entry2.get("means", {})
+        if set(means1) != set(means2):
+            differences.append((filename, "columns", "only in first: %s; only in second: %s" %
+                                (sorted(set(means1) - set(means2)), sorted(set(means2) - set(means1)))))
+        drifted = ["%s: %s != %s" % (name, means1[name], means2[name]) for name in sorted(means1) if
+                   name in means2 and not _isClose(means1[name], means2[name], rtol, atol)]
+        if drifted:
+            differences.append((filename, "means", "; ".join(drifted)))
+        if entry1["size"] != entry2["size"] or entry1["hash"] != entry2["hash"]:
+            differences.append((filename, "content", "size %d != %d or hash %s != %s" %
+                                (entry1["size"], entry2["size"], entry1["hash"], entry2["hash"])))
+    return differences
+
+
+def makeManifest():
+    """Command-line interface for building a manifest"""
+    parser = argparse.ArgumentParser(description="Build a manifest of the files in a data repository")
+    parser.add_argument("root", help="Data repository root (e.g., DATA/rerun/ci_hsc)")
+    parser.add_argument("output", help="Output manifest filename (JSON)")
+    parser.add_argument("-j", "--threads", type=int, default=8, help="Number of threads")
+    args = parser.parse_args()
+    writeManifest(buildManifest(args.root, args.threads), args.output)
+
+
+def diffManifests():
+    """Command-line interface for comparing manifests
+
+    The exit status is non-zero if there are differences other than in the
+    file contents alone (unless ``--strict`` is set, in which case any
+    difference counts).
+    """
+    parser = argparse.ArgumentParser(description="Compare manifests of data repositories")
+    parser.add_argument("manifest1", help="First (reference) manifest")
+    parser.add_argument("manifest2", help="Second manifest")
+    parser.add_argument("--rtol", type=float, default=1.0e-6, help="Relative tolerance for column means")
+    parser.add_argument("--atol", type=float, default=0.0, help="Absolute tolerance for column means")
+    parser.add_argument("--strict", default=False, action="store_true",
+                        help="Treat changes in file contents alone as differences")
+    args = parser.parse_args()
+    differences = compareManifests(readManifest(args.manifest1), readManifest(args.manifest2),
+                                   rtol=args.rtol, atol=args.atol)
+    numFailures = 0
+    for filename, kind, description in differences:
+        print("%s: %s: %s" % (filename, kind, description))
+        if kind != "content" or args.strict:
+            numFailures += 1
+    print("%d differences (%d significant)" % (len(differences), numFailures))
+    sys.exit(1 if numFailures > 0 else 0)
@@ -0,0 +1,159 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["OverlapIndex", "makeOverlapIndex"]
+
+import argparse
+from collections import defaultdict
+
+import numpy
+
+import lsst.geom
+from lsst.daf.persistence import Butler
+
+
+def _parsePatch(patch):
+    """Return the index of a patch, given as ``"x,y"`` or a pair of `int`"""
+    if isinstance(patch, str):
+        patch = patch.split(",")
+    xx, yy = patch
+    return int(xx), int(yy)
+
+
+class OverlapIndex:
+    """Index of which patches overlap which CCDs
+
+    The index is held as parallel arrays of overlapping pairs, which is
+    compact on disk; dictionaries are built on construction so that lookups
+    in either direction are O(1).
+
+    Parameters
+    ----------
+    visit, ccd : array_like of `int`
+        Visit and CCD of each overlapping pair.
+    tract, patchX, patchY : array_like of `int`
+        Tract and patch index of each overlapping pair.
+    """
+    _columns = ("visit", "ccd", "tract", "patchX", "patchY")
+
+    def __init__(self, visit, ccd, tract, patchX, patchY):
+        self.visit = numpy.asarray(visit, dtype=numpy.int32)
+        self.ccd = numpy.asarray(ccd, dtype=numpy.int16)
+        self.tract = numpy.asarray(tract, dtype=numpy.int32)
+        self.patchX = numpy.asarray(patchX, dtype=numpy.int16)
+        self.patchY = numpy.asarray(patchY, dtype=numpy.int16)
+        self._patches = defaultdict(list)  # (tract, patch index) for each (visit, ccd)
+        self._ccds = defaultdict(list)  # (visit, ccd) for each (tract, patch index)
+        for visit, ccd, tract, xx, yy in zip(self.visit.tolist(), self.ccd.tolist(), self.tract.tolist(),
+                                             self.patchX.tolist(), self.patchY.tolist()):
+            self._patches[(visit, ccd)].append((tract, (xx, yy)))
+            self._ccds[(tract, (xx, yy))].append((visit, ccd))
+
+    def __len__(self):
+        return len(self.visit)
+
+    @classmethod
+    def build(cls, skyMap, ccdList):
+        """Build the index from the CCD boundaries
+
+        Parameters
+        ----------
+        skyMap : `lsst.skymap.BaseSkyMap`
+            Sky map defining the tracts and patches.
+        ccdList : iterable of `tuple`
+            Visit (`int`), CCD (`int`), WCS (`lsst.afw.geom.SkyWcs`) and
+            bounding box (`lsst.geom.Box2I`) of each CCD.
+
+        Returns
+        -------
+        index : `OverlapIndex`
+            Index of the overlaps.
+        """
+        rows = []
+        for visit, ccd, wcs, bbox in ccdList:
+            corners = [wcs.pixelToSky(point) for point in lsst.geom.Box2D(bbox).getCorners()]
+            for tractInfo, patchInfoList in skyMap.findTractPatchList(corners):
+                for patchInfo in patchInfoList:
+                    xx, yy = patchInfo.getIndex()
+                    rows.append((visit, ccd, tractInfo.getId(), xx, yy))
+        return cls(*(zip(*rows) if rows else [[]]*len(cls._columns)))
+
+    @classmethod
+    def read(cls, filename):
+        """Read the index from a NumPy ``.npz`` file"""
+        with numpy.load(filename) as data:
+            return cls(*(data[name] for name in cls._columns))
+
+    def write(self, filename):
+        """Write the index to a NumPy ``.npz`` file"""
+        numpy.savez_compressed(filename, **{name: getattr(self, name) for name in self._columns})
+
+    def getPatches(self, visit, ccd):
+        """Return the patches that overlap a CCD
+
+        Returns
+        -------
+        patches : `list` of `tuple`
+            Tract (`int`) and patch (`str`, in the ``"x,y"`` form used for
+            Gen2 data identifiers) for each overlapping patch.
+        """
+        return [(tract, "%d,%d" % patch) for tract, patch in self._patches.get((visit, ccd), [])]
+
+    def getCcds(self, tract, patch):
+        """Return the CCDs that overlap a patch
+
+        Parameters
+        ----------
+        tract : `int`
+            Tract identifier.
+        patch : `str` or pair of `int`
+            Patch identifier, either as ``"x,y"`` or the patch index.
+
+        Returns
+        -------
+        ccds : `list` of `tuple`
+            Visit and CCD (`int`) for each overlapping CCD.
+        """
+        return list(self._ccds.get((tract, _parsePatch(patch)), []))
+
+
+def makeOverlapIndex():
+    """Command-line interface for building a CCD/patch overlap index"""
+    parser = argparse.ArgumentParser(description="Build an index of which patches overlap which CCDs")
+    parser.add_argument("root", help="Butler data root")
+    parser.add_argument("output", help="Output filename (.npz)")
+    parser.add_argument("--dataset", default="calexp", help="Dataset providing the WCS and bounding box")
+    parser.add_argument("--skymap", default="deepCoadd_skyMap", help="Sky map dataset")
+    parser.add_argument("--visitCcd", nargs=2, type=int, default=[], action="append",
+                        help="Visit and CCD to index (multiple OK; default is all that exist)")
+    args = parser.parse_args()
+
+    butler = Butler(args.root)
+    skyMap = butler.get(args.skymap)
+    visitCcdList = args.visitCcd
+    if not visitCcdList:
+        visitCcdList = [(visit, ccd) for visit, ccd in butler.queryMetadata(args.dataset, ["visit", "ccd"]) if
+                        butler.datasetExists(args.dataset, visit=visit, ccd=ccd)]
+    index = OverlapIndex.build(skyMap, ((visit, ccd, butler.get(args.dataset + "_wcs", visit=visit, ccd=ccd),
+                                         butler.get(args.dataset + "_bbox", visit=visit, ccd=ccd)) for
+                                        visit, ccd in visitCcdList))
+    index.write(args.output)
+    print("Wrote %d overlaps for %d CCDs to %s" % (len(index), len(visitCcdList), args.output))
@@ -0,0 +1,191 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["Prefetcher", "PrefetchingButler", "getDatasetFilename", "estimateDatasetSize"]
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _makeKey(dataId):
+    """Return a hashable key for a data identifier"""
+    return tuple(sorted(dict(dataId).items()))
+
+
+def getDatasetFilename(butler, dataset, dataId):
+    """Return the name of the file for a dataset, from a Gen2 or Gen3 butler
+
+    Gen3 butlers return a URI object (with the local path as ``ospath``),
+    while Gen2 butlers return the path itself.
+    """
+    if hasattr(butler, "getURI"):
+        return butler.getURI(dataset, dataId).ospath
+    return butler.getUri(dataset, dataId)
+
+
+def estimateDatasetSize(butler, dataset, dataId):
+    """Estimate the memory required for a dataset from its file size"""
+    try:
+        return os.stat(getDatasetFilename(butler, dataset, dataId)).st_size
+    except Exception:
+        return 0
+
+
+class Prefetcher:
+    """Read datasets for upcoming data identifiers in the background
+
+    Datasets are read by a pool of threads, each with its own butler (the
+    butler isn't thread-safe), so that the I/O for the next data identifiers
+    overlaps with the checks on the current one.
+
+    Parameters
+    ----------
+    makeButler : callable
+        Function returning a new butler.
+    datasets : iterable of `str`
+        Names of datasets to prefetch for each data identifier.
+    depth : `int`
+        Maximum number of data identifiers to prefetch ahead of the current
+        one.
+    maxBytes : `int` or `None`
+        Memory budget for prefetched datasets (bytes), estimated from the
+        sizes of the files. The estimate for a data identifier is reserved
+        before its reads are submitted, so reads in flight count against the
+        budget, and we don't prefetch another data identifier if its
+        reservation would exceed the budget.
+    numThreads : `int`
+        Number of threads for reading datasets.
+    """
+    def __init__(self, makeButler, datasets, depth=1, maxBytes=None, numThreads=4):
+        self.makeButler = makeButler
+        self.datasets = list(datasets)
+        self.depth = depth
+        self.maxBytes = maxBytes
+        self._executor = ThreadPoolExecutor(max_workers=max(1, numThreads))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._futures = {}  # Futures for datasets, indexed by data identifier key and dataset name
+        self._sizes = {}  # Estimated size of datasets reserved, indexed by data identifier key
+
+    def _getButler(self):
+        """Return the butler for the current thread"""
+        if not hasattr(self._local, "butler"):
+            self._local.butler = self.makeButler()
+        return self._local.butler
+
+    def _read(self, dataset, dataId):
+        """Read a dataset; called in a worker thread"""
+        return self._getButler().get(dataset, dataId)
+
+    def _estimate(self, dataId):
+        """Estimate the memory required for the datasets of a data identifier
+        """
+        butler = self._getButler()
+        return sum(estimateDatasetSize(butler, ds, dataId) for ds in self.datasets)
+
+    @property
+    def numBytes(self):
+        """Estimated size of the datasets held or being read (bytes)"""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def schedule(self, dataIdList):
+        """Start prefetching for data identifiers
+
+        Parameters
+        ----------
+        dataIdList : iterable of `dict`
+            Data identifiers, in the order in which they will be used. The
+            first is the current data identifier, which is always scheduled;
+            up to ``depth`` of the remainder are scheduled, subject to the
+            memory budget.
+        """
+        for ii, dataId in enumerate(dataIdList):
+            if ii > self.depth:
+                break
+            key = _makeKey(dataId)
+            if key in self._futures:
+                continue
+            size = self._estimate(dataId) if self.maxBytes is not None else 0
+            if ii > 0 and self.maxBytes is not None and self.numBytes + size > self.maxBytes:
+                break
+            with self._lock:
+                self._sizes[key] = size
+            self._futures[key] = {ds: self._executor.submit(self._read, ds, dataId) for
+                                  ds in self.datasets}
+
+    def take(self, dataset, dataId):
+        """Return the future for a prefetched dataset, or `None`
+
+        The future is handed out only once, so the caller owns the dataset
+        and may modify it (e.g., ``reset_index(inplace=True)`` on a
+        DataFrame) without affecting anyone else: later requests for the same
+        dataset are read afresh. The memory reserved for it is released along
+        with the rest of the data identifier (see `release`).
+        """
+        if dataId is None:
+            return None
+        return self._futures.get(_makeKey(dataId), {}).pop(dataset, None)
+
+    def release(self, dataId):
+        """Drop the prefetched datasets for a data identifier"""
+        key = _makeKey(dataId)
+        for future in self._futures.pop(key, {}).values():
+            future.cancel()
+        with self._lock:
+            self._sizes.pop(key, None)
+
+    def close(self):
+        """Drop all prefetched datasets and shut down the threads"""
+        for key in list(self._futures):
+            for future in self._futures.pop(key).values():
+                future.cancel()
+        self._executor.shutdown(wait=True)
+        self._sizes.clear()
+
+
+class PrefetchingButler:
+    """Butler proxy that serves datasets from a `Prefetcher`
+
+    Datasets that have been prefetched are returned from the prefetcher
+    (waiting for them to be read if necessary) the first time they're
+    requested; everything else is passed through to the underlying butler.
+
+    Parameters
+    ----------
+    butler : `lsst.daf.persistence.Butler` or `lsst.daf.butler.Butler`
+        Butler to use for anything that hasn't been prefetched.
+    prefetcher : `Prefetcher`
+        Source of prefetched datasets.
+    """
+    def __init__(self, butler, prefetcher):
+        self._butler = butler
+        self._prefetcher = prefetcher
+
+    def get(self, dataset, dataId=None, **kwargs):
+        future = self._prefetcher.take(dataset, dataId) if not kwargs else None
+        if future is not None and not future.cancelled():
+            return future.result()
+        return self._butler.get(dataset, dataId, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._butler, name)
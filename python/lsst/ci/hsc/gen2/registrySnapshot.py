@@ -0,0 +1,113 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["loadSnapshot", "SnapshotSqliteRegistry", "useRegistrySnapshots"]
+
+import os
+import sqlite3
+import itertools
+import threading
+import urllib.parse
+
+import lsst.daf.persistence.registries
+from lsst.daf.persistence.registries import SqliteRegistry, SqlRegistry
+
+_snapshots = {}  # Snapshot URI and keeper connection, indexed by registry filename
+_counter = itertools.count()
+_lock = threading.Lock()
+
+
+def _getSignature(filename):
+    """Return the size and modification time of a file, for detecting
+    changes
+    """
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def loadSnapshot(filename):
+    """Load a snapshot of an SQLite registry into memory
+
+    The registry is read once, opened read-only in immutable mode (so SQLite
+    takes no locks on it), and copied into a shared-cache in-memory database.
+    The snapshot is reloaded if the file has changed (by size or modification
+    time) since it was loaded.
+
+    Parameters
+    ----------
+    filename : `str`
+        Name of SQLite registry file.
+
+    Returns
+    -------
+    uri : `str`
+        URI for connecting to the snapshot (with ``uri=True``).
+    """
+    filename = os.path.realpath(filename)
+    signature = _getSignature(filename)
+    with _lock:
+        snapshot = _snapshots.get(filename)
+        if snapshot is not None and snapshot[0] == signature:
+            return snapshot[1]
+        uri = "file:ci_hsc_registry_%d?mode=memory&cache=shared" % (next(_counter),)
+        keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)  # Keeps the database alive
+        source = sqlite3.connect("file:%s?mode=ro&immutable=1" % (urllib.parse.quote(filename),), uri=True)
+        try:
+            source.backup(keeper)
+        finally:
+            source.close()
+        if snapshot is not None:
+            snapshot[2].close()
+        _snapshots[filename] = (signature, uri, keeper)
+        return uri
+
+
+class SnapshotSqliteRegistry(SqliteRegistry):
+    """SQLite registry served from an in-memory snapshot
+
+    Lookups run against an in-memory copy of the registry (see
+    `loadSnapshot`), so they are fast and involve no filesystem locks. Each
+    registry has its own connection to the snapshot, so butlers in different
+    threads don't share a connection.
+
+    Parameters
+    ----------
+    location : `str`
+        Name of SQLite registry file.
+    """
+    def __init__(self, location):
+        conn = None
+        if os.path.exists(location):
+            conn = sqlite3.connect(loadSnapshot(location), uri=True)
+            conn.text_factory = str
+            self.root = location
+        SqlRegistry.__init__(self, conn)
+
+
+def useRegistrySnapshots():
+    """Serve all Gen2 SQLite registries in this process from in-memory
+    snapshots
+
+    This affects butlers constructed after the call. The registries are
+    assumed not to change while they're in use; a snapshot is only reloaded
+    when a new butler finds that the file has changed.
+    """
+    lsst.daf.persistence.registries.SqliteRegistry = SnapshotSqliteRegistry
@@ -0,0 +1,199 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["ResultRecorder", "RecordingButler"]
+
+import json
+import time
+import threading
+from xml.etree import ElementTree
+
+from .prefetch import estimateDatasetSize
+
+
+class ResultRecorder:
+    """Structured record of the checks and dataset reads made by a validator
+
+    Each record is a `dict` with the following keys:
+
+    ``validator``
+        Name of the validation class.
+    ``kind``
+        ``check`` for an assertion, or the name of the butler method for a
+        dataset access (``get`` or ``datasetExists``).
+    ``name``
+        Description of the check, or the name of the dataset.
+    ``dataId``
+        Data identifier being validated (checks) or accessed (reads).
+    ``duration``
+        Time taken (sec). For a check, this is the time since the previous
+        record in the same thread, i.e., the time spent computing what was
+        checked.
+    ``bytes``
+        Size of the file read (bytes); zero for checks.
+    ``outcome``
+        ``pass``, ``fail`` or ``error``.
+    ``message``
+        Error message, for outcomes other than ``pass``.
+
+    Parameters
+    ----------
+    validator : `str`
+        Name of the validation class.
+    """
+    def __init__(self, validator):
+        self.validator = validator
+        self.dataId = {}  # Data identifier currently being validated
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def mark(self):
+        """Reset the start time for the next check in this thread"""
+        self._local.start = time.perf_counter()
+
+    def _elapsed(self):
+        """Return the time since the last record in this thread"""
+        now = time.perf_counter()
+        elapsed = now - getattr(self._local, "start", now)
+        self._local.start = now
+        return elapsed
+
+    def add(self, kind, name, dataId, duration, numBytes=0, outcome="pass", message=None):
+        """Add a record"""
+        record = dict(validator=self.validator, kind=kind, name=name,
+                      dataId={key: value for key, value in dict(dataId or {}).items()},
+                      duration=duration, bytes=numBytes, outcome=outcome)
+        if message is not None:
+            record["message"] = message
+        with self._lock:
+            self.records.append(record)
+
+    def addCheck(self, description, success):
+        """Record the outcome of a check"""
+        self.add("check", description, self.dataId, self._elapsed(), outcome="pass" if success else "fail")
+
+    def addError(self, exc, description=None):
+        """Record an exception raised while validating"""
+        if description is None:
+            description = "Validation of %s" % (self.dataId,)
+        self.add("check", description, self.dataId, self._elapsed(), outcome="error",
+                 message="%s: %s" % (type(exc).__name__, exc))
+
+    @property
+    def failures(self):
+        """Records of checks that did not pass"""
+        return [record for record in self.records if record["outcome"] != "pass"]
+
+    def summarize(self):
+        """Return a one-line summary of the records"""
+        checks = [record for record in self.records if record["kind"] == "check"]
+        reads = [record for record in self.records if record["kind"] != "check"]
+        return ("%d checks (%d failed) in %.1f sec; %d dataset accesses reading %.1f MB in %.1f sec" %
+                (len(checks), len(self.failures), sum(record["duration"] for record in checks),
+                 len(reads), sum(record["bytes"] for record in reads)/1024**2,
+                 sum(record["duration"] for record in reads)))
+
+    def writeJson(self, filename):
+        """Write the records to a file as JSON lines
+
+        Any existing file is overwritten, so a rerun doesn't leave stale
+        records behind.
+        """
+        with open(filename, "w") as fd:
+            for record in self.records:
+                fd.write(json.dumps(record, default=str) + "\n")
+
+    def writeJUnit(self, filename):
+        """Write the records to a file in JUnit XML format
+
+        Each record becomes a test case; dataset accesses are named by the
+        dataset, with the number of bytes read as a property.
+        """
+        root = ElementTree.Element("testsuites")
+        suite = ElementTree.SubElement(root, "testsuite", name=self.validator,
+                                       tests=str(len(self.records)),
+                                       failures=str(sum(rr["outcome"] == "fail" for rr in self.records)),
+                                       errors=str(sum(rr["outcome"] == "error" for rr in self.records)),
+                                       time="%.6f" % sum(rr["duration"] for rr in self.records))
+        for record in self.records:
+            case = ElementTree.SubElement(suite, "testcase",
+                                          classname="%s.%s" % (self.validator, record["kind"]),
+                                          name="%s %s" % (record["name"], record["dataId"]),
+                                          time="%.6f" % record["duration"])
+            properties = ElementTree.SubElement(case, "properties")
+            ElementTree.SubElement(properties, "property", name="bytes", value=str(record["bytes"]))
+            if record["outcome"] != "pass":
+                ElementTree.SubElement(case, "failure" if record["outcome"] == "fail" else "error",
+                                       message=record.get("message", record["name"]))
+        ElementTree.ElementTree(root).write(filename, encoding="unicode", xml_declaration=True)
+
+    def write(self, filename):
+        """Write the records, in JUnit XML format if the filename ends with
+        ``.xml`` or as JSON lines otherwise
+        """
+        if filename.endswith(".xml"):
+            self.writeJUnit(filename)
+        else:
+            self.writeJson(filename)
+
+
+class RecordingButler:
+    """Butler proxy that records the dataset accesses
+
+    Calls to ``get`` and ``datasetExists`` are timed and recorded (with the
+    size of the file, for ``get``); everything else is passed through to the
+    underlying butler.
+
+    Parameters
+    ----------
+    butler : `lsst.daf.persistence.Butler` or `lsst.daf.butler.Butler`
+        Butler to use.
+    recorder : `ResultRecorder`
+        Recorder for the dataset accesses.
+    """
+    def __init__(self, butler, recorder):
+        self._butler = butler
+        self._recorder = recorder
+
+    def _call(self, method, dataset, dataId, *args, **kwargs):
+        """Call a butler method and record it"""
+        start = time.perf_counter()
+        try:
+            result = getattr(self._butler, method)(dataset, dataId, *args, **kwargs)
+        except Exception as exc:
+            self._recorder.add(method, dataset, dataId, time.perf_counter() - start, outcome="error",
+                               message="%s: %s" % (type(exc).__name__, exc))
+            raise
+        duration = time.perf_counter() - start
+        numBytes = estimateDatasetSize(self._butler, dataset, dataId) if method == "get" else 0
+        self._recorder.add(method, dataset, dataId, duration, numBytes)
+        self._recorder.mark()  # Don't count the read against the next check
+        return result
+
+    def get(self, dataset, dataId=None, **kwargs):
+        return self._call("get", dataset, dataId, **kwargs)
+
+    def datasetExists(self, dataset, dataId=None, **kwargs):
+        return self._call("datasetExists", dataset, dataId, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._butler, name)
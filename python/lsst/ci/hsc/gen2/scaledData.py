@@ -0,0 +1,263 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["MAX_VISIT", "readCards", "updateCards", "getVisitOffsets", "replicateRaw", "makeScaledData"]
+
+import os
+import math
+import mmap
+import json
+import glob
+import random
+import shutil
+import argparse
+from collections import defaultdict
+
+from .fileIntegrity import FITS_CARD_SIZE, iterHdus
+
+MAX_VISIT = 999999  # Largest visit that can be encoded in an HSC FRAMEID (HSCA + 8 digits)
+STAGES_FILENAME = "stages.json"  # Name of the file listing the data to process
+
+
+def _iterCards(buffer):
+    """Iterate over the header cards in a FITS file
+
+    Yields
+    ------
+    offset : `int`
+        Offset of the card in the file.
+    keyword : `str`
+        Keyword of the card.
+    """
+    for headerStart, dataStart, _ in iterHdus(buffer):
+        for offset in range(headerStart, dataStart, FITS_CARD_SIZE):
+            yield offset, buffer[offset:offset + 8].rstrip().decode("ascii", "replace")
+
+
+def _parseValue(card):
+    """Parse the value of a header card"""
+    value = card[10:].decode("ascii", "replace")
+    if value.lstrip().startswith("'"):
+        return value.lstrip()[1:].split("'", 1)[0].rstrip()
+    value = value.split("/", 1)[0].strip()
+    for converter in (int, float):
+        try:
+            return converter(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _formatCard(keyword, value, comment):
+    """Format a header card in FITS fixed format"""
+    if isinstance(value, str):
+        value = "'%-8s'" % (value,)
+        card = "%-8s= %-20s" % (keyword, value)
+    elif isinstance(value, float):
+        card = "%-8s= %20s" % (keyword, repr(value).upper())
+    else:
+        card = "%-8s= %20d" % (keyword, value)
+    if comment:
+        card += " / " + comment
+    return card[:FITS_CARD_SIZE].ljust(FITS_CARD_SIZE).encode("ascii")
+
+
+def readCards(filename, keywords):
+    """Read the values of header keywords from all HDUs of a FITS file
+
+    Parameters
+    ----------
+    filename : `str`
+        Name of FITS file.
+    keywords : iterable of `str`
+        Keywords to read.
+
+    Returns
+    -------
+    values : `dict` [`str`, `object`]
+        Values of the keywords that are present (the first occurrence, if a
+        keyword appears in multiple HDUs).
+    """
+    keywords = set(keywords)
+    values = {}
+    with open(filename, "rb") as fd:
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for offset, keyword in _iterCards(buffer):
+                if keyword in keywords and keyword not in values:
+                    values[keyword] = _parseValue(buffer[offset:offset + FITS_CARD_SIZE])
+    return values
+
+
+def updateCards(filename, update):
+    """Update header keywords in place, in all HDUs of a FITS file
+
+    The file is memory-mapped and only the affected cards are rewritten, so
+    the pixels are not touched.
+
+    Parameters
+    ----------
+    filename : `str`
+        Name of FITS file to update.
+    update : callable
+        Function taking the keyword and its current value, and returning the
+        new value (or `None` to leave it alone).
+    """
+    with open(filename, "r+b") as fd:
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_WRITE) as buffer:
+            for offset, keyword in _iterCards(buffer):
+                card = buffer[offset:offset + FITS_CARD_SIZE]
+                if card[8:10] != b"= ":
+                    continue
+                value = update(keyword, _parseValue(card))
+                if value is None:
+                    continue
+                text = card.decode("ascii", "replace")
+                comment = text.split(" / ", 1)[1].strip() if " / " in text else None
+                buffer[offset:offset + FITS_CARD_SIZE] = _formatCard(keyword, value, comment)
+
+
+def getVisitOffsets(visits, factor):
+    """Return the visit increments for the replicas
+
+    Replicas are separated by more than the span of the original visits, so
+    they can't collide, and the increments are even because HSC visits are.
+    Replicas are placed above the original visits while they fit below
+    `MAX_VISIT`, and then below them.
+
+    Parameters
+    ----------
+    visits : iterable of `int`
+        Original visits.
+    factor : `int`
+        Number of copies of each visit, including the original.
+
+    Returns
+    -------
+    offsets : `list` of `int`
+        Amount by which to increase the visits of each copy; the first is
+        zero, for the original.
+
+    Raises
+    ------
+    ValueError
+        If there isn't room for the requested number of copies.
+    """
+    visits = list(visits)
+    span = max(visits) - min(visits) + 2
+    stride = span + span % 2
+    numAbove = (MAX_VISIT - max(visits))//stride
+    numBelow = (min(visits) - 1)//stride
+    if factor > 1 + numAbove + numBelow:
+        raise ValueError("Scale factor %d is too large: visits are limited to %d, so the maximum is %d" %
+                         (factor, MAX_VISIT, 1 + numAbove + numBelow))
+    offsets = [stride*ii for ii in range(min(factor, 1 + numAbove))]
+    offsets += [-stride*ii for ii in range(1, factor - len(offsets) + 1)]
+    return offsets
+
+
+def replicateRaw(source, target, visitOffset, raOffset, decOffset):
+    """Copy a raw file, changing its visit and offsetting its WCS
+
+    Parameters
+    ----------
+    source : `str`
+        Name of original raw file.
+    target : `str`
+        Name of file to write.
+    visitOffset : `int`
+        Amount by which to increase the visit.
+    raOffset, decOffset : `float`
+        Amount by which to offset the WCS reference coordinates (degrees).
+    """
+    def update(keyword, value):
+        if keyword == "EXP-ID" and value.startswith("HSCE"):
+            return "HSCE%08d" % (int(value[4:]) + visitOffset)
+        if keyword == "FRAMEID" and value.startswith("HSCA"):
+            return "HSCA%08d" % (int(value[4:]) + 100*visitOffset)
+        if keyword == "CRVAL1":
+            return float(value) + raOffset
+        if keyword == "CRVAL2":
+            return float(value) + decOffset
+        return None
+
+    shutil.copyfile(source, target)
+    updateCards(target, update)
+
+
+def makeScaledData():
+    """Command-line interface for generating a scaled-up data set
+
+    The raws are replicated under new visit identifiers (with their WCS
+    dithered by a small random offset), and a list of the data to process is
+    written for SConstruct's ``--scaled-data`` option. The existing ingest
+    step registers the new raws, and the jointcal data for the replicas are
+    linked to those of the original visits.
+    """
+    parser = argparse.ArgumentParser(description="Generate a scaled-up data set for benchmarking")
+    parser.add_argument("source", help="Directory containing testdata_ci_hsc (with raw and jointcal)")
+    parser.add_argument("output", help="Output directory")
+    parser.add_argument("--factor", type=int, default=10, help="Scale factor (number of copies of each raw)")
+    parser.add_argument("--dither", type=float, default=2.0, help="Maximum WCS offset of replicas (arcsec)")
+    parser.add_argument("--seed", type=int, default=12345, help="Random number seed for the offsets")
+    args = parser.parse_args()
+
+    rawList = sorted(glob.glob(os.path.join(args.source, "raw", "*.fits")))
+    originals = []
+    for filename in rawList:
+        cards = readCards(filename, ["EXP-ID", "DET-ID", "FILTER01", "CRVAL2"])
+        originals.append((filename, int(cards["EXP-ID"][4:]), int(cards["DET-ID"]), cards["FILTER01"],
+                          cards.get("CRVAL2", 0.0)))
+    if not originals:
+        parser.error("No raws found in %s" % (os.path.join(args.source, "raw"),))
+    try:
+        offsets = getVisitOffsets([visit for _, visit, _, _, _ in originals], args.factor)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    rawDir = os.path.join(args.output, "raw")
+    jointcalDir = os.path.join(args.output, "jointcal")
+    for dirName in (rawDir, jointcalDir):
+        os.makedirs(dirName, exist_ok=True)
+    rng = random.Random(args.seed)
+    stages = defaultdict(list)
+    for offset in offsets:
+        dither = [rng.uniform(-args.dither, args.dither)/3600 for _ in range(2)] if offset else [0, 0]
+        for filename, visit, ccd, filterName, dec in originals:
+            newVisit = visit + offset
+            target = os.path.join(rawDir, "HSC-%07d-%03d.fits" % (newVisit, ccd))
+            if offset == 0:
+                if not os.path.lexists(target):
+                    os.symlink(os.path.abspath(filename), target)
+            else:
+                replicateRaw(filename, target, offset, dither[0]/math.cos(math.radians(dec)),
+                             dither[1])
+            for dataset in ("jointcal_photoCalib", "jointcal_wcs"):
+                source = os.path.join(args.source, "jointcal", "%s-%07d-%03d.fits" % (dataset, visit, ccd))
+                link = os.path.join(jointcalDir, "%s-%07d-%03d.fits" % (dataset, newVisit, ccd))
+                if os.path.exists(source) and not os.path.lexists(link):
+                    os.symlink(os.path.abspath(source), link)
+            stages[filterName].append((newVisit, ccd))
+
+    with open(os.path.join(args.output, STAGES_FILENAME), "w") as fd:
+        json.dump(stages, fd, indent=1)
+    print("Wrote %d raws for %d visits to %s" %
+          (sum(len(dataList) for dataList in stages.values()),
+           len(set(visit for dataList in stages.values() for visit, _ in dataList)), args.output))
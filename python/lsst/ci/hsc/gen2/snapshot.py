@@ -0,0 +1,246 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["QUANTILES", "getColumns", "summarizeCatalog", "getSnapshotFilename", "writeSnapshot",
+           "readSnapshot", "compareSnapshots"]
+
+import os
+
+import numpy
+
+QUANTILES = numpy.array([0.05, 0.25, 0.5, 0.75, 0.95])  # Quantiles to record for distributions
+SLOT_CENTROID = "slot_Centroid"  # Centroid against which to measure offsets of other centroids
+PSF_FLUX = "slot_PsfFlux_instFlux"  # Flux column for matched-star photometry
+CALIB_FLUX = "slot_CalibFlux_instFlux"  # Reference flux column for matched-star photometry
+MATCHED_FLAG = "calib_photometry_used"  # Flag identifying stars matched to the reference catalog
+
+
+def getColumns(catalog):
+    """Return the columns of a catalog as arrays
+
+    This uses columnar access throughout; the records are never iterated
+    over. The aliases of an afw catalog (e.g., the ``slot_`` fields) are
+    included, under their alias names, as they would be in a
+    `pandas.DataFrame`.
+
+    Parameters
+    ----------
+    catalog : `lsst.afw.table.BaseCatalog`, `pandas.DataFrame` or
+              `lsst.pipe.tasks.parquetTable.ParquetTable`
+        Catalog to convert.
+
+    Returns
+    -------
+    columns : `dict` [`str`, `numpy.ndarray`]
+        One-dimensional numeric and boolean columns, indexed by name.
+    """
+    if hasattr(catalog, "toDataFrame"):
+        catalog = catalog.toDataFrame()
+    if hasattr(catalog, "schema"):
+        if not catalog.isContiguous():
+            catalog = catalog.copy(deep=True)
+        columns = {}
+        for name in catalog.schema.getNames():
+            try:
+                columns[name] = numpy.asarray(catalog[name])
+            except Exception:
+                continue  # Not a type we can access as a column (e.g., a string)
+        for alias, target in catalog.schema.getAliasMap().items():
+            for name in list(columns):
+                if name == target or name.startswith(target + "_"):
+                    columns[alias + name[len(target):]] = columns[name]
+    else:
+        columns = {name: catalog[name].to_numpy() for name in catalog.columns if isinstance(name, str)}
+    return {name: values for name, values in columns.items() if
+            values.ndim == 1 and values.dtype.kind in "biuf"}
+
+
+def _quantiles(values):
+    """Return the quantiles of the finite values in an array"""
+    values = values[numpy.isfinite(values)]
+    if len(values) == 0:
+        return numpy.full(len(QUANTILES), numpy.nan)
+    return numpy.quantile(values, QUANTILES)
+
+
+def _stack(names, rows, width):
+    """Convert lists of names and summary rows to arrays for persistence"""
+    return (numpy.array(names, dtype=str),
+            numpy.array(rows, dtype=float).reshape(len(rows), width))
+
+
+def summarizeCatalog(catalog):
+    """Compute a compact summary of a catalog
+
+    The summary includes:
+
+    - the number of rows;
+    - the quantiles of each flux column;
+    - the quantiles of the offset of each centroid from the slot centroid;
+    - the fraction of rows for which each flag is set; and
+    - the quantiles of the PSF flux relative to the calibration flux for
+      stars matched to the photometric reference catalog.
+
+    Parameters
+    ----------
+    catalog : `lsst.afw.table.BaseCatalog`, `pandas.DataFrame` or
+              `lsst.pipe.tasks.parquetTable.ParquetTable`
+        Catalog to summarize.
+
+    Returns
+    -------
+    summary : `dict` [`str`, `numpy.ndarray`]
+        Summary arrays. Names and values are stored in parallel arrays, e.g.
+        ``fluxNames`` and ``fluxQuantiles``.
+    """
+    columns = getColumns(catalog)
+    summary = dict(numRows=numpy.array([len(catalog)]))
+
+    fluxNames = sorted(name for name, values in columns.items() if values.dtype.kind == "f" and
+                       name.endswith(("_instFlux", "Flux")))
+    summary["fluxNames"], summary["fluxQuantiles"] = _stack(
+        fluxNames, [_quantiles(columns[name]) for name in fluxNames], len(QUANTILES))
+
+    centroidNames = []
+    centroidOffsets = []
+    if SLOT_CENTROID + "_x" in columns and SLOT_CENTROID + "_y" in columns:
+        xSlot = columns[SLOT_CENTROID + "_x"]
+        ySlot = columns[SLOT_CENTROID + "_y"]
+        for name in sorted(columns):
+            if not name.endswith("Centroid_x") or name.startswith("slot_"):
+                continue
+            alg = name[:-len("_x")]
+            if alg + "_y" not in columns:
+                continue
+            centroidNames.append(alg)
+            centroidOffsets.append(_quantiles(numpy.hypot(columns[name] - xSlot,
+                                                          columns[alg + "_y"] - ySlot)))
+    summary["centroidNames"], summary["centroidOffsets"] = _stack(centroidNames, centroidOffsets,
+                                                                  len(QUANTILES))
+
+    flagNames = sorted(name for name, values in columns.items() if values.dtype.kind == "b")
+    summary["flagNames"], summary["flagRates"] = _stack(
+        flagNames, [columns[name].mean() if len(catalog) > 0 else numpy.nan for name in flagNames], 1)
+
+    matchedNames = []
+    matchedQuantiles = []
+    if MATCHED_FLAG in columns and PSF_FLUX in columns and CALIB_FLUX in columns:
+        matched = columns[MATCHED_FLAG]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            ratio = columns[PSF_FLUX][matched]/columns[CALIB_FLUX][matched]
+        matchedNames.append(PSF_FLUX + "/" + CALIB_FLUX)
+        matchedQuantiles.append(_quantiles(ratio))
+    summary["matchedNames"], summary["matchedQuantiles"] = _stack(matchedNames, matchedQuantiles,
+                                                                  len(QUANTILES))
+    return summary
+
+
+def getSnapshotFilename(root, dataset, dataId):
+    """Return the filename of the snapshot for a dataset
+
+    Parameters
+    ----------
+    root : `str`
+        Root directory for snapshots.
+    dataset : `str`
+        Name of dataset.
+    dataId : `dict`
+        Data identifier.
+
+    Returns
+    -------
+    filename : `str`
+        Name of the snapshot file.
+    """
+    name = "_".join("%s=%s" % (key, dataId[key]) for key in sorted(dataId)) or "all"
+    return os.path.join(root, dataset, name + ".npz")
+
+
+def writeSnapshot(filename, summary):
+    """Write a catalog summary to a NumPy ``.npz`` file"""
+    dirName = os.path.dirname(filename)
+    if dirName and not os.path.isdir(dirName):
+        os.makedirs(dirName, exist_ok=True)
+    numpy.savez_compressed(filename, **summary)
+
+
+def readSnapshot(filename):
+    """Read a catalog summary from a NumPy ``.npz`` file"""
+    with numpy.load(filename) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _compareTable(reference, summary, namesKey, valuesKey, rtol, atol):
+    """Compare the values for the names common to two summaries
+
+    Returns
+    -------
+    failures : `list` of `str`
+        Names for which the values differ beyond the tolerance.
+    missing : `list` of `str`
+        Names in the reference but not in the summary.
+    """
+    refNames = reference[namesKey]
+    names = summary[namesKey]
+    common, refIndex, index = numpy.intersect1d(refNames, names, return_indices=True)
+    close = numpy.isclose(summary[valuesKey][index], reference[valuesKey][refIndex],
+                          rtol=rtol, atol=atol, equal_nan=True).all(axis=1)
+    missing = numpy.setdiff1d(refNames, names)
+    return common[~close].tolist(), missing.tolist()
+
+
+def compareSnapshots(reference, summary, rtol=0.01, atol=0.0, flagTol=0.01):
+    """Compare a catalog summary against a reference
+
+    Parameters
+    ----------
+    reference : `dict` [`str`, `numpy.ndarray`]
+        Reference summary (see `summarizeCatalog`).
+    summary : `dict` [`str`, `numpy.ndarray`]
+        Summary to check.
+    rtol, atol : `float`
+        Relative and absolute tolerance for row counts and quantiles.
+    flagTol : `float`
+        Absolute tolerance for flag rates.
+
+    Returns
+    -------
+    failures : `dict` [`str`, `list` of `str`]
+        Names of the columns that differ beyond the tolerance, indexed by the
+        kind of summary (``numRows``, ``flux``, ``centroid``, ``flag``,
+        ``matched`` or ``missing``). Kinds without failures are not
+        included.
+    """
+    failures = {}
+    if not numpy.isclose(summary["numRows"], reference["numRows"], rtol=rtol, atol=atol).all():
+        failures["numRows"] = ["%d != %d" % (summary["numRows"][0], reference["numRows"][0])]
+    missing = []
+    for kind, valuesKey, kindRtol, kindAtol in (("flux", "fluxQuantiles", rtol, atol),
+                                                ("centroid", "centroidOffsets", rtol, atol),
+                                                ("flag", "flagRates", 0.0, flagTol),
+                                                ("matched", "matchedQuantiles", rtol, atol)):
+        different, absent = _compareTable(reference, summary, kind + "Names", valuesKey, kindRtol, kindAtol)
+        if different:
+            failures[kind] = different
+        missing += absent
+    if missing:
+        failures["missing"] = missing
+    return failures
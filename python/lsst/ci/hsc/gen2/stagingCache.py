@@ -0,0 +1,300 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["StagingCache", "stageInputs"]
+
+import os
+import time
+import shutil
+import fcntl
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+from contextlib import contextmanager
+
+from .manifest import hashFile
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (source TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, hash TEXT);
+CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, size INTEGER);
+CREATE TABLE IF NOT EXISTS trees (key TEXT PRIMARY KEY, source TEXT, lastUsed REAL);
+CREATE TABLE IF NOT EXISTS treeObjects (key TEXT, hash TEXT);
+CREATE INDEX IF NOT EXISTS treeObjectsHash ON treeObjects (hash);
+"""
+
+
+class StagingCache:
+    """Node-local cache of input directories
+
+    Files are copied into the cache once, and stored under their content
+    hash (``objects/<hash>``), so identical files are stored once however
+    many directories or versions of the test data they appear in. Each
+    staged directory is then recreated as a tree of hard links to the objects
+    (``trees/<key>``), where the key is a hash of the names and contents of
+    the files, so an unchanged directory maps to the same tree every time.
+
+    Several checkouts on the same node can share a cache: staging holds an
+    exclusive lock on the cache, and the index of files, objects and trees
+    is an SQLite database. Once the objects exceed the size cap, trees are
+    evicted in order of least recent use, along with the objects that only
+    they use; trees used within the last ``protectTime`` are never evicted,
+    since they may be in use by another checkout.
+
+    Staged files are made read-only, since they are shared.
+
+    Parameters
+    ----------
+    root : `str`
+        Cache directory; this should be on fast node-local storage.
+    maxBytes : `int` or `None`
+        Size cap for the cache (bytes).
+    protectTime : `float`
+        Time since last use for which trees are protected from eviction
+        (sec).
+    """
+    def __init__(self, root, maxBytes=None, protectTime=86400.0):
+        self.root = os.path.abspath(root)
+        self.maxBytes = maxBytes
+        self.protectTime = protectTime
+        for name in ("objects", "trees"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    @contextmanager
+    def _lock(self):
+        """Hold the cache lock, and provide a connection to the index"""
+        with open(os.path.join(self.root, "lock"), "a") as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            try:
+                with sqlite3.connect(os.path.join(self.root, "index.sqlite3")) as db:
+                    db.executescript(SCHEMA)
+                    yield db
+            finally:
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    def _getObjectPath(self, digest):
+        return os.path.join(self.root, "objects", digest)
+
+    def _getTreePath(self, key):
+        return os.path.join(self.root, "trees", key)
+
+    def _addObject(self, db, filename):
+        """Return the hash of a file, copying it into the cache if necessary
+
+        Files that haven't changed (by size and modification time) since they
+        were last staged aren't read again.
+        """
+        stat = os.stat(filename)
+        row = db.execute("SELECT hash FROM files WHERE source = ? AND size = ? AND mtime = ?",
+                         (filename, stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row is not None and os.path.exists(self._getObjectPath(row[0])):
+            return row[0]
+        fd, temp = tempfile.mkstemp(dir=os.path.join(self.root, "objects"), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as output, open(filename, "rb") as source:
+                shutil.copyfileobj(source, output)
+            digest = hashFile(temp)  # Reading the local copy is cheaper than reading the source again
+            target = self._getObjectPath(digest)
+            if os.path.exists(target):
+                os.unlink(temp)
+            else:
+                os.chmod(temp, stat.st_mode & 0o555)
+                os.rename(temp, target)
+        except BaseException:
+            if os.path.exists(temp):
+                os.unlink(temp)
+            raise
+        db.execute("INSERT OR REPLACE INTO objects (hash, size) VALUES (?, ?)", (digest, stat.st_size))
+        db.execute("INSERT OR REPLACE INTO files (source, size, mtime, hash) VALUES (?, ?, ?, ?)",
+                   (filename, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def _listEntries(self, db, source, directory, prefix, expanding=()):
+        """List the contents of a directory for staging, adding the files to
+        the cache
+
+        Symbolic links that resolve to somewhere within ``source`` are kept
+        as relative links to the same place, so they resolve within the
+        staged tree. Links that resolve outside ``source`` are followed,
+        since they would otherwise dangle (if relative) or point outside the
+        cache. Links that don't resolve at all are kept as they are.
+
+        Parameters
+        ----------
+        db : `sqlite3.Connection`
+            Connection to the index.
+        source : `str`
+            Real path of the directory being staged.
+        directory : `str`
+            Real path of the directory to list: ``source``, or a directory
+            outside it that a link resolves to.
+        prefix : `str`
+            Path of ``directory`` within the staged tree.
+        expanding : `tuple` of `str`
+            Directories outside ``source`` that are being listed, to avoid
+            following a cycle of links.
+
+        Returns
+        -------
+        entries : `list` of (`str`, `str` or `None`, `str` or `None`)
+            Path within the staged tree, and the hash of the contents (for a
+            file) or the link target (for a link).
+        """
+        entries = []
+        for dirName, dirList, fileList in os.walk(directory):
+            dirList.sort()
+            links = [dd for dd in dirList if os.path.islink(os.path.join(dirName, dd))]
+            for name in sorted(fileList + links):
+                path = os.path.join(dirName, name)
+                relative = os.path.join(prefix, os.path.relpath(path, directory))
+                if not os.path.islink(path):
+                    entries.append((relative, self._addObject(db, path), None))
+                    continue
+                target = os.path.realpath(path)
+                if not os.path.exists(target) or target in expanding:
+                    entries.append((relative, None, os.readlink(path)))
+                elif os.path.commonpath([target, source]) == source:
+                    link = os.path.relpath(target, os.path.join(source, os.path.dirname(relative)))
+                    entries.append((relative, None, link))
+                elif os.path.isdir(target):
+                    entries += self._listEntries(db, source, target, relative, expanding + (target,))
+                else:
+                    entries.append((relative, self._addObject(db, target), None))
+        return entries
+
+    def stage(self, source):
+        """Stage a directory (or file) into the cache
+
+        Parameters
+        ----------
+        source : `str`
+            Directory or file to stage. Symbolic links within a directory are
+            kept as links if they resolve within it, and followed otherwise
+            (see `_listEntries`).
+
+        Returns
+        -------
+        path : `str`
+            Path to the staged copy.
+        """
+        source = os.path.realpath(source)
+        with self._lock() as db:
+            if os.path.isdir(source):
+                entries = self._listEntries(db, source, source, "")
+            else:
+                entries = [(os.path.basename(source), self._addObject(db, source), None)]
+
+            hasher = hashlib.blake2b(digest_size=16)
+            for relative, digest, link in entries:
+                hasher.update(("%s\0%s\0%s\n" % (relative, digest, link)).encode())
+            key = hasher.hexdigest()
+            target = self._getTreePath(key)
+            if not os.path.exists(target):
+                self._makeTree(target, entries)
+                db.execute("DELETE FROM treeObjects WHERE key = ?", (key,))
+                db.executemany("INSERT INTO treeObjects (key, hash) VALUES (?, ?)",
+                               set((key, digest) for _, digest, _ in entries if digest is not None))
+            db.execute("INSERT OR REPLACE INTO trees (key, source, lastUsed) VALUES (?, ?, ?)",
+                       (key, source, time.time()))
+            self._evict(db, key)
+        if not os.path.isdir(source):
+            return os.path.join(target, os.path.basename(source))
+        return target
+
+    def _makeTree(self, target, entries):
+        """Create a tree of links to objects
+
+        The tree is built under a temporary name and renamed into place, so
+        a partially-built tree is never visible.
+        """
+        temp = tempfile.mkdtemp(dir=os.path.dirname(target), prefix=".tmp-")
+        try:
+            for relative, digest, link in entries:
+                path = os.path.join(temp, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if link is not None:
+                    os.symlink(link, path)
+                else:
+                    os.link(self._getObjectPath(digest), path)
+            os.rename(temp, target)
+        except BaseException:
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+
+    @property
+    def numBytes(self):
+        """Total size of the objects in the cache (bytes)"""
+        with self._lock() as db:
+            return self._getSize(db)
+
+    def _getSize(self, db):
+        return db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def _evict(self, db, keep):
+        """Evict least-recently used trees until the cache fits in the cap
+
+        Parameters
+        ----------
+        db : `sqlite3.Connection`
+            Connection to the index.
+        keep : `str`
+            Key of a tree that must not be evicted.
+        """
+        if self.maxBytes is None:
+            return
+        size = self._getSize(db)
+        candidates = db.execute("SELECT key FROM trees WHERE key != ? AND lastUsed < ? ORDER BY lastUsed",
+                                (keep, time.time() - self.protectTime)).fetchall()
+        for key, in candidates:
+            if size <= self.maxBytes:
+                break
+            shutil.rmtree(self._getTreePath(key), ignore_errors=True)
+            db.execute("DELETE FROM trees WHERE key = ?", (key,))
+            db.execute("DELETE FROM treeObjects WHERE key = ?", (key,))
+            orphans = db.execute("SELECT hash, size FROM objects WHERE hash NOT IN "
+                                 "(SELECT hash FROM treeObjects)").fetchall()
+            for digest, objectSize in orphans:
+                try:
+                    os.unlink(self._getObjectPath(digest))
+                except FileNotFoundError:
+                    pass
+                db.execute("DELETE FROM objects WHERE hash = ?", (digest,))
+                db.execute("DELETE FROM files WHERE hash = ?", (digest,))
+                size -= objectSize
+
+
+def stageInputs():
+    """Command-line interface for staging inputs into a node-local cache
+
+    The path to the staged copy of each input is printed, one per line.
+    """
+    parser = argparse.ArgumentParser(description="Stage inputs into a node-local cache")
+    parser.add_argument("cache", help="Cache directory")
+    parser.add_argument("source", nargs="+", help="Directories or files to stage")
+    parser.add_argument("--max-size", type=float, default=None, help="Size cap for the cache (GB)")
+    parser.add_argument("--protect-time", type=float, default=24.0,
+                        help="Don't evict inputs used within this time (hours)")
+    args = parser.parse_args()
+
+    cache = StagingCache(args.cache, None if args.max_size is None else int(args.max_size*1024**3),
+                         args.protect_time*3600)
+    for source in args.source:
+        print(cache.stage(source))
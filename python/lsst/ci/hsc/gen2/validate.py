@@ -38,6 +38,15 @@ from lsst.meas.algorithms import LoadIndexedReferenceObjectsTask
 from lsst.utils import getPackageDir
 from lsst.pipe.tasks.parquetTable import ParquetTable
 
+from .fileIntegrity import statFiles, checkFiles
+from .aggregate import TableChecksum, getKeyColumns, checksumParquet
+from .crossMatch import RefCatIndex, ARCSEC
+from .prefetch import Prefetcher, PrefetchingButler, getDatasetFilename
+from .results import ResultRecorder, RecordingButler
+from .registrySnapshot import useRegistrySnapshots
+from .snapshot import (summarizeCatalog, getSnapshotFilename, writeSnapshot, readSnapshot,
+                       compareSnapshots)
+
 # We need to import lsst.obs.subaru because it provides the
 # subaru_FilterFraction plugin that's referenced in some of the configs below,
 # and for some reason isn't being imported automatically by the config load
@@ -77,28 +86,78 @@ def main():
                         help="Data identifier, e.g., visit=123 ccd=45", metavar="KEY=VALUE")
     parser.add_argument("--filepath", default=None, help="Load a file with expected values to "
                         "validate with (e.g. an expected catalog schema")
+    parser.add_argument("--inputId", nargs="*", action=IdValueAction, default=[],
+                        help="Data identifier of an input to a consolidated dataset (multiple OK)",
+                        metavar="KEY=VALUE")
+    parser.add_argument("--check-files", dest="checkFiles", default=False, action="store_true",
+                        help="Check the files on disk for all datasets, not just those read")
+    parser.add_argument("--check-fits", dest="checkFits", default=False, action="store_true",
+                        help="Check the structure of FITS files against their size")
+    parser.add_argument("--io-threads", dest="ioThreads", type=int, default=8,
+                        help="Number of threads for concurrent file checks and prefetching")
+    parser.add_argument("--prefetch", type=int, default=0,
+                        help="Number of data identifiers to prefetch datasets for in the background")
+    parser.add_argument("--prefetch-memory", dest="prefetchMemory", type=float, default=2048,
+                        help="Memory budget for prefetched datasets (MB)")
+    parser.add_argument("--results", default=None,
+                        help="Write a record of each check and dataset access to this file "
+                             "(JUnit XML if it ends with '.xml', otherwise JSON lines)")
+    parser.add_argument("--collect-failures", dest="collectFailures", default=False, action="store_true",
+                        help="Run all checks and report every failure, instead of stopping at the first")
+    parser.add_argument("--snapshot-dir", dest="snapshotDir", default=None,
+                        help="Directory of reference catalog summaries to compare against")
+    parser.add_argument("--write-snapshot", dest="writeSnapshot", default=False, action="store_true",
+                        help="Write catalog summaries to the snapshot directory instead of comparing")
+    parser.add_argument("--snapshot-rtol", dest="snapshotRtol", type=float, default=0.01,
+                        help="Relative tolerance for comparing catalog summaries")
+    parser.add_argument("--snapshot-flag-tol", dest="snapshotFlagTol", type=float, default=0.01,
+                        help="Absolute tolerance for comparing flag rates in catalog summaries")
+    parser.add_argument("--cross-match", dest="crossMatch", default=False, action="store_true",
+                        help="Cross-match stars with the reference catalogs as an astrometric check")
+    parser.add_argument("--registry-snapshot", dest="registrySnapshot", default=False, action="store_true",
+                        help="Serve Gen2 registry lookups from an in-memory snapshot of the registry")
     args = parser.parse_args()
 
     if not args.cls.endswith("Validation") or args.cls not in globals():
         parser.error("Unrecognised validation class: %s" % (args.cls))
 
+    if args.registrySnapshot and not args.gen3:
+        useRegistrySnapshots()
+
     root = args.root
     if args.rerun:
         if not args.gen3:
             root = os.path.join(root, "rerun", args.rerun)
 
-    validator = globals()[args.cls](root, collection=args.collection, gen3=args.gen3, filepath=args.filepath)
+    intKeys = ["visit", "ccd", "tract"]
+    if args.gen3:
+        intKeys.extend(["patch", "detector", "exposure"])
+    inputIds = [{key: int(value) if key in intKeys else value for key, value in dataId.items()}
+                for dataId in args.inputId]
+
+    validator = globals()[args.cls](root, collection=args.collection, gen3=args.gen3, filepath=args.filepath,
+                                    inputIds=inputIds if inputIds else None,
+                                    checkFiles=args.checkFiles, checkFits=args.checkFits,
+                                    ioThreads=args.ioThreads, snapshotDir=args.snapshotDir,
+                                    writeSnapshot=args.writeSnapshot, snapshotRtol=args.snapshotRtol,
+                                    snapshotFlagTol=args.snapshotFlagTol, prefetch=args.prefetch,
+                                    prefetchBytes=int(args.prefetchMemory*1024**2),
+                                    recorder=ResultRecorder(args.cls) if args.results else None,
+                                    collectFailures=args.collectFailures, crossMatch=args.crossMatch)
     if args.id:
-        intKeys = ["visit", "ccd", "tract"]
-        if args.gen3:
-            intKeys.extend(["patch", "detector", "exposure"])
-        for dataId in args.id:
-            dataId = {key: int(value) if key in intKeys else value for
-                      key, value in dataId.items()}
-            validator.run(dataId)
+        dataIdList = [{key: int(value) if key in intKeys else value for key, value in dataId.items()}
+                      for dataId in args.id]
     else:
         # Run once with empty dataId
-        validator.run({})
+        dataIdList = [{}]
+    try:
+        validator.runAll(dataIdList)
+    finally:
+        if args.results:
+            validator.log.info("Writing results to %s: %s" % (args.results, validator.recorder.summarize()))
+            validator.recorder.write(args.results)
+    if validator.failures:
+        raise AssertionError("Failed %d tests: %s" % (len(validator.failures), "; ".join(validator.failures)))
 
 
 class Validation(object):
@@ -109,9 +168,25 @@ class Validation(object):
     _matchDataset = None  # Dataset name of matches
     _matchFullDataset = None  # Dataset name of denormalized matches
     _minMatches = 10  # Minimum number of matches
+    _snapshotDataset = None  # Dataset name of catalog to compare against a reference snapshot
+    _crossMatchRefCats = ()  # Names of reference catalogs to cross-match with the source catalog
+    _aggregateDataset = None  # Dataset name of a table consolidated from several inputs
+    _aggregateInputDataset = None  # Dataset name of the inputs to _aggregateDataset
+    _aggregateColumns = ()  # Columns to checksum (if present) in addition to the index
+    _crossMatchRadius = 1.0  # Maximum separation for cross-match (arcsec)
+    # Minimum fraction of stars with a cross-match and maximum median
+    # separation (arcsec), for each reference catalog. Gaia is much shallower
+    # than PS1, so fewer of our stars have a counterpart. These are
+    # provisional: the check is only run with --cross-match until they have
+    # been calibrated against the values logged by a full run.
+    _crossMatchThresholds = {"ps1_pv3_3pi_20170110": (0.2, 0.2),
+                             "gaia_dr2_20200414": (0.05, 0.2)}
     _butler = {}
 
-    def __init__(self, root, log=None, gen3=False, collection=None, filepath=None):
+    def __init__(self, root, log=None, gen3=False, collection=None, filepath=None, checkFiles=False,
+                 checkFits=False, ioThreads=8, snapshotDir=None, writeSnapshot=False, snapshotRtol=0.01,
+                 snapshotFlagTol=0.01, inputIds=None, prefetch=0, prefetchBytes=None, recorder=None,
+                 collectFailures=False, crossMatch=False):
         if log is None:
             log = lsst.log.Log.getDefaultLogger()
         self.log = log
@@ -119,22 +194,62 @@ class Validation(object):
         self.gen3 = gen3
         self.collection = collection
         self.filepath = filepath
+        self.checkFiles = checkFiles  # Check files for all of _datasets, not just _files?
+        self.checkFits = checkFits  # Check FITS structure of files?
+        self.ioThreads = ioThreads  # Number of threads for concurrent file checks
+        self.snapshotDir = snapshotDir  # Directory of reference catalog summaries
+        self.writeSnapshot = writeSnapshot  # Write catalog summaries instead of comparing?
+        self.snapshotRtol = snapshotRtol  # Relative tolerance for catalog summaries
+        self.snapshotFlagTol = snapshotFlagTol  # Absolute tolerance for flag rates
+        self.inputIds = inputIds  # Data identifiers of the inputs to _aggregateDataset
+        self.prefetch = prefetch  # Number of data identifiers to prefetch ahead
+        self.prefetchBytes = prefetchBytes  # Memory budget for prefetching (bytes)
+        self.recorder = recorder  # ResultRecorder for checks and dataset accesses, or None
+        self.collectFailures = collectFailures  # Continue after failures, collecting them?
+        self.failures = []  # Descriptions of failed checks (if collecting failures)
+        self.crossMatch = crossMatch  # Cross-match stars with the reference catalogs?
         self._butler = None
+        self._doFiles = True  # Check files in run? False if they've been checked in bulk
 
     @property
     def butler(self):
         if not self._butler:
-            if self.gen3:
-                GEN3_REPO_ROOT = os.path.join(getPackageDir("ci_hsc_gen2"), "DATAgen3")
-                self._butler = lsst.daf.butler.Butler(GEN3_REPO_ROOT, collections=self.collection)
-            else:
-                self._butler = Butler(self.root)
+            self._butler = self.makeButler()
         return self._butler
 
+    def makeButler(self):
+        """Construct a new butler for the data repository
+
+        If we're recording results, the butler records dataset accesses.
+        """
+        if self.gen3:
+            GEN3_REPO_ROOT = os.path.join(getPackageDir("ci_hsc_gen2"), "DATAgen3")
+            butler = lsst.daf.butler.Butler(GEN3_REPO_ROOT, collections=self.collection)
+        else:
+            butler = Butler(self.root)
+        if self.recorder is not None:
+            butler = RecordingButler(butler, self.recorder)
+        return butler
+
+    @property
+    def prefetchDatasets(self):
+        """List of datasets read by `run`, which may be prefetched
+
+        Metadata are excluded, because they may not be readable (DM-4927).
+        """
+        datasets = [ds for ds in self._datasets if not ds.endswith("metadata")]
+        datasets += [self._sourceDataset, self._matchDataset, self._matchFullDataset, self._snapshotDataset]
+        return [ds for ii, ds in enumerate(datasets) if ds is not None and ds not in datasets[:ii]]
+
     def assertTrue(self, description, success):
         logger = self.log.info if success else self.log.fatal
         logger("%s: %s" % (description, "PASS" if success else "FAIL"))
+        if self.recorder is not None:
+            self.recorder.addCheck(description, success)
         if not success:
+            if self.collectFailures:
+                self.failures.append(description)
+                return
             raise AssertionError("Failed test: %s" % description)
 
     def assertFalse(self, description, success):
@@ -209,13 +324,50 @@ class Validation(object):
                 return
             raise
 
+    @property
+    def fileDatasets(self):
+        """List of datasets for which to check the file on disk"""
+        datasets = list(self._files)
+        if self.checkFiles:
+            datasets += [ds for ds in self._datasets if ds not in datasets and
+                         not (self.gen3 and ds.endswith("metadata"))]
+        return datasets
+
+    def getFilename(self, dataset, dataId):
+        """Return the name of the file on disk for a dataset"""
+        return getDatasetFilename(self.butler, dataset, dataId)
+
     def validateFile(self, dataId, dataset):
-        filename = self.butler.getUri(dataset, dataId)
-        if self.gen3:
-            assert filename.startswith("file://")
-            filename = os.path.join(self.root, filename[len("file://"):])
-        self.assertTrue("%s exists on disk" % dataset, os.path.exists(filename))
-        self.assertGreater("%s has non-zero size" % dataset, os.stat(filename).st_size, 0)
+        self.validateFiles([dataId], [dataset])
+
+    def validateFiles(self, dataIdList, datasets):
+        """Check the files for many datasets and data identifiers
+
+        All the filenames are resolved first, and then the files are checked
+        concurrently, so that we're not waiting on the latency of each
+        filesystem operation in turn. If ``checkFits`` is set, the structure
+        of FITS files is verified as well (without reading the data), which
+        catches truncated outputs.
+        """
+        checks = [(dataId, ds) for dataId in dataIdList for ds in datasets]
+        if not checks:
+            return
+        self.log.info("Validating %d files for %d data identifiers" % (len(checks), len(dataIdList)))
+        filenames = [self.getFilename(ds, dataId) for dataId, ds in checks]
+        sizes = statFiles(filenames, self.ioThreads)
+        for (dataId, ds), size in zip(checks, sizes):
+            self.assertTrue("%s exists on disk for %s" % (ds, dataId), size is not None)
+            if size is not None:
+                self.assertGreater("%s has non-zero size for %s" % (ds, dataId), size, 0)
+        if not self.checkFits:
+            return
+        # Missing files have already been reported
+        present = [(check, filename) for check, filename, size in zip(checks, filenames, sizes) if
+                   size is not None]
+        errors = checkFiles([filename for _, filename in present], self.ioThreads)
+        for ((dataId, ds), filename), error in zip(present, errors):
+            self.assertTrue("%s has valid FITS structure for %s (%s)" %
+                            (ds, dataId, error if error else filename), error is None)
 
     def validateSources(self, dataId):
         src = self.butler.get(self._sourceDataset, dataId)
@@ -237,6 +389,121 @@ class Validation(object):
         matches = self.butler.get(self._matchFullDataset, dataId)
         self.assertGreater("Number of full matches", len(matches), self._minMatches)
 
+    def validateCrossMatch(self, dataId):
+        """Cross-match the stars in the source catalog with the reference
+        catalogs, independently of the reference object loader
+
+        This provides a fast astrometric sanity check: the reference catalog
+        shards are read directly into a KD-tree, and the source coordinates
+        are matched in bulk. Only primary, unblended stars are matched (see
+        `selectCrossMatchStars`).
+        """
+        sources = self.butler.get(self._sourceDataset, dataId)
+        stars = self.selectCrossMatchStars(sources)
+        ra = sources["coord_ra"][stars]
+        dec = sources["coord_dec"][stars]
+        for refCat in self._crossMatchRefCats:
+            minFraction, maxMedian = self._crossMatchThresholds[refCat]
+            index = RefCatIndex.fromDirectory(os.path.join(getPackageDir("ci_hsc_gen2"), refCat))
+            stats = index.match(ra, dec, self._crossMatchRadius*ARCSEC)
+            self.log.info("Cross-matched %d of %d stars with %s: median separation %.3f arcsec, "
+                          "RMS %.3f arcsec" % (stats.numMatches, stats.numSources, refCat,
+                                               stats.medianSeparation, stats.rmsSeparation))
+            self.assertGreater("Number of cross-matches with %s" % refCat, stats.numMatches,
+                               max(self._minMatches, minFraction*stats.numSources))
+            self.assertLess("Median cross-match separation with %s (arcsec)" % refCat,
+                            stats.medianSeparation, maxMedian)
+
+    def selectCrossMatchStars(self, sources):
+        """Select the sources to cross-match with the reference catalogs
+
+        These are the primary sources (where that's been determined) that
+        weren't deblended, i.e., neither deblend parents nor children, and
+        that are classified as stars.
+
+        Returns
+        -------
+        select : `numpy.ndarray` of `bool`
+            Which sources to cross-match.
+        """
+        names = sources.schema.getNames()
+        select = sources["parent"] == 0
+        if "detect_isPrimary" in names:
+            select &= sources["detect_isPrimary"]
+        if "deblend_nChild" in names:
+            select &= sources["deblend_nChild"] == 0
+        if "base_ClassificationExtendedness_value" in names:
+            select &= sources["base_ClassificationExtendedness_value"] < 0.5
+        return select
+
+    def getInputIds(self, dataId):
+        """Return the data identifiers of the inputs to _aggregateDataset
+
+        These are the ``inputIds`` provided to the constructor, if any.
+        Otherwise, for Gen3 we can look them up in the registry, but for Gen2
+        we have no way of knowing which inputs were processed, so we return
+        `None`.
+        """
+        if self.inputIds is not None:
+            return self.inputIds
+        if not self.gen3:
+            return None
+        registry = self.butler.registry
+        dimensions = registry.getDatasetType(self._aggregateDataset).dimensions.names
+        where = {key: value for key, value in dataId.items() if key in dimensions}
+        refs = registry.queryDatasets(self._aggregateInputDataset, collections=self.collection,
+                                      dataId=where, findFirst=True)
+        return [ref.dataId for ref in refs]
+
+    def validateAggregate(self, dataId):
+        """Check that a consolidated table contains exactly its inputs
+
+        The input tables are streamed one row group at a time, accumulating
+        the row count and checksums of the key columns, so memory use is
+        bounded by the size of a single row group. The totals are compared
+        against those of the consolidated table.
+        """
+        inputIds = self.getInputIds(dataId)
+        if inputIds is None:
+            self.log.warn("No inputs specified for %s; not validating aggregation" % self._aggregateDataset)
+            return
+        self.assertGreater("Number of inputs to %s" % self._aggregateDataset, len(inputIds), 0)
+        outputFilename = self.getFilename(self._aggregateDataset, dataId)
+        columns = getKeyColumns(outputFilename, self._aggregateColumns)
+        self.log.info("Checksumming columns %s of %d %s inputs" %
+                      (columns, len(inputIds), self._aggregateInputDataset))
+        total = TableChecksum(columns)
+        for inputId in inputIds:
+            total += checksumParquet(self.getFilename(self._aggregateInputDataset, inputId), columns)
+        output = checksumParquet(outputFilename, columns)
+        self.assertEqual("Number of rows in %s equals the sum over %s" %
+                         (self._aggregateDataset, self._aggregateInputDataset), output.numRows, total.numRows)
+        self.assertEqual("Checksums of columns in %s that differ from the sum over %s" %
+                         (self._aggregateDataset, self._aggregateInputDataset), total.compare(output), [])
+
+    def validateSnapshot(self, dataId):
+        """Compare a summary of the catalog against a reference snapshot
+
+        The summary (see `lsst.ci.hsc.gen2.snapshot.summarizeCatalog`) is
+        computed with columnar operations, so this is fast even for large
+        catalogs. If ``writeSnapshot`` is set, the summary is written as the
+        new reference instead.
+        """
+        filename = getSnapshotFilename(self.snapshotDir, self._snapshotDataset, dataId)
+        summary = summarizeCatalog(self.butler.get(self._snapshotDataset, dataId))
+        if self.writeSnapshot:
+            self.log.info("Writing snapshot of %s to %s" % (self._snapshotDataset, filename))
+            writeSnapshot(filename, summary)
+            return
+        self.assertTrue("Reference snapshot %s exists" % (filename,), os.path.exists(filename))
+        failures = compareSnapshots(readSnapshot(filename), summary, rtol=self.snapshotRtol,
+                                    flagTol=self.snapshotFlagTol)
+        for kind in failures:
+            self.log.warn("%s differs from snapshot in %s: %s" % (self._snapshotDataset, kind,
+                                                                  ", ".join(failures[kind])))
+        self.assertEqual("%s matches reference snapshot (kinds of differences)" % (self._snapshotDataset,),
+                         sorted(failures), [])
+
     def validateSchema(self, dataset, dataId, tableName):
         """Check the schema of the parquet dataset match that in the DDL"""
         self.log.info("Validating %s match the schema in %s", dataset, self.filepath)
@@ -268,9 +535,8 @@ class Validation(object):
             self.log.info("Validating dataset %s for %s" % (ds, dataId))
             self.validateDataset(dataId, ds)
 
-        for f in self._files:
-            self.log.info("Validating file %s for %s" % (f, dataId))
-            self.validateFile(dataId, f)
+        if self._doFiles:
+            self.validateFiles([dataId], self.fileDatasets)
 
         if self._sourceDataset is not None:
             self.log.info("Validating source output for %s" % dataId)
@@ -284,6 +550,73 @@ class Validation(object):
             self.log.info("Validating matchFull output for %s" % dataId)
             self.validateMatchFull(dataId)
 
+        if self.crossMatch and self._crossMatchRefCats:
+            self.log.info("Validating cross-match with reference catalogs for %s" % dataId)
+            self.validateCrossMatch(dataId)
+
+        if self._aggregateDataset is not None:
+            self.log.info("Validating aggregation of %s for %s" % (self._aggregateDataset, dataId))
+            self.validateAggregate(dataId)
+
+        if self._snapshotDataset is not None and self.snapshotDir is not None:
+            self.log.info("Validating %s against snapshot for %s" % (self._snapshotDataset, dataId))
+            self.validateSnapshot(dataId)
+
+    def runCollecting(self, description, func, *args):
+        """Run a validation function, dealing with any exception it raises
+
+        The exception is recorded (if we're recording results). If we're
+        collecting failures, it is logged and added to the failures instead
+        of being raised: a failed check may have made later checks in the
+        function impossible, but checks elsewhere can still go ahead.
+        """
+        try:
+            func(*args)
+        except Exception as exc:
+            if self.recorder is not None:
+                self.recorder.addError(exc, description)
+            if not self.collectFailures:
+                raise
+            self.log.fatal("%s raised %s: %s" % (description, type(exc).__name__, exc))
+            self.failures.append("%s raised %s" % (description, type(exc).__name__))
+
+    def runAll(self, dataIdList):
+        """Run validation for each of a list of data identifiers
+
+        The files for all the data identifiers are checked in a single batch
+        up front, rather than one data identifier at a time. If ``prefetch``
+        is set, the datasets for the following data identifiers are read in
+        the background while the current one is being checked.
+        """
+        if self.recorder is not None:
+            self.recorder.dataId = {}
+            self.recorder.mark()
+        self.runCollecting("Validation of files", self.validateFiles, dataIdList, self.fileDatasets)
+        self._doFiles = False
+        prefetcher = None
+        butler = self.butler
+        if self.prefetch > 0 and len(dataIdList) > 1:
+            # Read the datasets for the next data identifiers in the
+            # background while we're checking the current one.
+            prefetcher = Prefetcher(self.makeButler, self.prefetchDatasets, depth=self.prefetch,
+                                    maxBytes=self.prefetchBytes, numThreads=self.ioThreads)
+            self._butler = PrefetchingButler(butler, prefetcher)
+        try:
+            for ii, dataId in enumerate(dataIdList):
+                if prefetcher is not None:
+                    prefetcher.schedule(dataIdList[ii:])
+                if self.recorder is not None:
+                    self.recorder.dataId = dataId
+                    self.recorder.mark()
+                self.runCollecting("Validation of %s" % (dataId,), self.run, dataId)
+                if prefetcher is not None:
+                    prefetcher.release(dataId)
+        finally:
+            self._doFiles = True
+            if prefetcher is not None:
+                prefetcher.close()
+                self._butler = butler
+
     def scons(self, *args, **kwargs):
         """Strip target,source,env from scons' call"""
         kwargs.pop("target")
@@ -306,6 +639,8 @@ class SfmValidation(Validation):
     _sourceDataset = "src"
     _matchDataset = "srcMatch"
     _matchFullDataset = "srcMatchFull"
+    _snapshotDataset = "src"
+    _crossMatchRefCats = ("ps1_pv3_3pi_20170110", "gaia_dr2_20200414")
 
     def validateSources(self, dataId):
         catalog = Validation.validateSources(self, dataId)
@@ -388,6 +723,8 @@ class MeasureValidation(Validation):
     _sourceDataset = "deepCoadd_meas"
     _matchDataset = "deepCoadd_measMatch"
     _matchFullDataset = "deepCoadd_measMatchFull"
+    _snapshotDataset = "deepCoadd_meas"
+    _crossMatchRefCats = ("ps1_pv3_3pi_20170110", "gaia_dr2_20200414")
 
     def validateSources(self, dataId):
         catalog = Validation.validateSources(self, dataId)
@@ -401,13 +738,19 @@ class MeasureValidation(Validation):
                         "calib_photometry_used" in catalog.schema)
         self.assertTrue("calib_photometry_reserved field exists in deepCoadd_meas catalog",
                         "calib_photometry_reserved" in catalog.schema)
-        childrenFailed = []
-        for column in catalog.schema:
-            if column.field.getName().startswith("merge_footprint"):
-                for parent in catalog.getChildren(0):
-                    for child in catalog.getChildren(parent.getId()):
-                        if child[column.key] != parent[column.key]:
-                            childrenFailed.append(child.getId())
+        # Compare children against their (top-level) parents column-wise,
+        # rather than iterating over the records.
+        ids = catalog["id"]
+        parents = catalog["parent"]
+        sortedIndex = numpy.argsort(ids)
+        parentIndex = sortedIndex[numpy.searchsorted(ids, parents, sorter=sortedIndex).clip(0, len(ids) - 1)]
+        isChild = (parents != 0) & (ids[parentIndex] == parents) & (parents[parentIndex] == 0)
+        childrenFailed = set()
+        for name in catalog.schema.getNames():
+            if name.startswith("merge_footprint"):
+                values = catalog[name]
+                childrenFailed.update(ids[isChild & (values != values[parentIndex])])
+        childrenFailed = sorted(childrenFailed)
 
         self.assertTrue("merge_footprint from parent propagated to children {}".format(childrenFailed),
                         len(childrenFailed) == 0)
@@ -449,6 +792,7 @@ class ForcedPhotCcdValidation(Validation):
     _datasets = ["forcedPhotCcd_config", "forcedPhotCcd_metadata",
                  "forced_src", "forced_src_schema"]
     _sourceDataset = "forced_src"
+    _snapshotDataset = "forced_src"
 
 
 class WriteObjectValidation(Validation):
@@ -457,6 +801,7 @@ class WriteObjectValidation(Validation):
 
 class TransformObjectValidation(Validation):
     _datasets = ["transformObjectCatalog_config", "objectTable"]
+    _snapshotDataset = "objectTable"
 
     def run(self, dataId, **kwargs):
         Validation.run(self, dataId, **kwargs)
@@ -465,6 +810,9 @@ class TransformObjectValidation(Validation):
 
 class ConsolidateObjectValidation(Validation):
     _datasets = ["consolidateObjectTable_config", "objectTable_tract"]
+    _aggregateDataset = "objectTable_tract"
+    _aggregateInputDataset = "objectTable"
+    _aggregateColumns = ("objectId", "parentObjectId")
 
 
 class WriteSourceValidation(Validation):
@@ -477,6 +825,9 @@ class TransformSourceValidation(Validation):
 
 class ConsolidateSourceValidation(Validation):
     _datasets = ["sourceTable_visit"]
+    _aggregateDataset = "sourceTable_visit"
+    _aggregateInputDataset = "sourceTable"
+    _aggregateColumns = ("sourceId", "ccdVisitId", "parentSourceId")
 
     def run(self, dataId, **kwargs):
         Validation.run(self, dataId, **kwargs)
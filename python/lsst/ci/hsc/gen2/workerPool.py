@@ -0,0 +1,301 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["PRELOAD", "WorkerServer", "warmWorkers"]
+
+import os
+import sys
+import json
+import stat
+import time
+import runpy
+import signal
+import socket
+import struct
+import argparse
+import importlib
+import selectors
+import threading
+import traceback
+
+# Modules to import before serving, so that requests don't pay for them
+PRELOAD = ("lsst.afw.image", "lsst.afw.table", "lsst.meas.algorithms", "lsst.meas.base",
+           "lsst.pipe.base", "lsst.pipe.tasks.processCcd", "lsst.pipe.tasks.makeCoaddTempExp",
+           "lsst.pipe.tasks.postprocess", "lsst.meas.base.forcedPhotCcd", "lsst.obs.subaru")
+MAX_REQUEST = 1 << 24  # Maximum size of a request (bytes)
+
+# The protocol (which bin/runInWorker.py implements independently, so that
+# the client doesn't need to import the stack): the client sends a request
+# as a line of JSON with the "script" to run, its "args", and the "cwd" and
+# "env" to run it with. The server replies with frames of a one-byte kind
+# and a four-byte big-endian length, followed by the payload: b"O" frames
+# carry stdout, b"E" frames carry stderr, and a final b"X" frame carries the
+# exit status as a decimal string.
+#
+# The requests carry the client's whole environment, so the socket must be in
+# a directory that only the user can get into.
+OUTPUT = b"O"
+ERROR = b"E"
+EXIT = b"X"
+
+
+def _checkPrivate(directory):
+    """Check that a directory is owned by us and closed to everybody else
+
+    Raises
+    ------
+    RuntimeError
+        If the directory isn't private.
+    """
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError("Socket directory %s isn't a directory private to this user" % (directory,))
+
+
+def _sendFrame(conn, kind, payload):
+    conn.sendall(kind + struct.pack(">I", len(payload)) + payload)
+
+
+def _readRequest(conn):
+    """Read a request from a client"""
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            raise ValueError("Connection closed before request was complete")
+        data += chunk
+        if len(data) > MAX_REQUEST:
+            raise ValueError("Request is too large")
+    return json.loads(data.decode())
+
+
+def _exitCode(status):
+    """Convert a wait status to an exit status (negative if killed by a
+    signal)
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _runChild(request, stdoutFd, stderrFd):
+    """Run a script in a forked worker; never returns
+
+    Parameters
+    ----------
+    request : `dict`
+        Request from the client.
+    stdoutFd, stderrFd : `int`
+        File descriptors to which to send the standard output and error.
+    """
+    code = 1
+    try:
+        os.setpgid(0, 0)  # So the server can kill the task along with any processes it starts
+        os.dup2(stdoutFd, 1)
+        os.dup2(stderrFd, 2)
+        os.close(stdoutFd)
+        os.close(stderrFd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.argv = [request["script"]] + list(request["args"])
+        try:
+            runpy.run_path(request["script"], run_name="__main__")
+            code = 0
+        except SystemExit as exc:
+            if exc.code is None or isinstance(exc.code, int):
+                code = exc.code or 0
+            else:
+                print(exc.code, file=sys.stderr)
+        except BaseException:
+            traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+class WorkerServer:
+    """Server that runs command-line task scripts in warm worker processes
+
+    The server imports the heavy modules once, then forks a worker for each
+    request. The worker starts with everything already imported, but is
+    otherwise a fresh process: state set up by one task (configs, logging,
+    butlers) can't leak into the next, just as when each runs in its own
+    Python.
+
+    Parameters
+    ----------
+    socketPath : `str`
+        Path of Unix socket on which to listen.
+    numWorkers : `int`
+        Maximum number of workers to run at once.
+    idleTimeout : `float`
+        Time without requests after which the server exits (sec).
+    preload : iterable of `str`
+        Names of modules to import before serving.
+    """
+    def __init__(self, socketPath, numWorkers, idleTimeout=600.0, preload=PRELOAD):
+        self.socketPath = socketPath
+        self.numWorkers = max(1, numWorkers)
+        self.idleTimeout = idleTimeout
+        self.preload = list(preload)
+        self._slots = threading.BoundedSemaphore(self.numWorkers)
+        self._lock = threading.Lock()
+        self._numActive = 0
+        self._lastActive = time.monotonic()
+
+    def _relay(self, conn, pid, stdoutFd, stderrFd):
+        """Relay a worker's output, error and exit status to the client
+
+        If the client goes away (e.g., it's interrupted), the worker and any
+        processes it started are terminated. The client sends nothing after
+        its request, so the connection becoming readable means it has been
+        closed.
+        """
+        clientGone = False
+
+        def terminate():
+            try:
+                os.killpg(pid, signal.SIGTERM)
+            except OSError:
+                pass  # Already gone
+
+        selector = selectors.DefaultSelector()
+        selector.register(stdoutFd, selectors.EVENT_READ, OUTPUT)
+        selector.register(stderrFd, selectors.EVENT_READ, ERROR)
+        selector.register(conn, selectors.EVENT_READ, None)
+        try:
+            while len(selector.get_map()) > (0 if clientGone else 1):
+                for key, _ in selector.select():
+                    if key.data is None:
+                        clientGone = True
+                        selector.unregister(conn)
+                        terminate()
+                        continue
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        selector.unregister(key.fd)
+                        continue
+                    if clientGone:
+                        continue
+                    try:
+                        _sendFrame(conn, key.data, data)
+                    except OSError:
+                        clientGone = True
+                        selector.unregister(conn)
+                        terminate()
+            _, status = os.waitpid(pid, 0)
+            if not clientGone:
+                _sendFrame(conn, EXIT, str(_exitCode(status)).encode())
+        except OSError:
+            pass
+        finally:
+            selector.close()
+            os.close(stdoutFd)
+            os.close(stderrFd)
+            conn.close()
+            with self._lock:
+                self._numActive -= 1
+                self._lastActive = time.monotonic()
+            self._slots.release()
+
+    def _isIdle(self):
+        with self._lock:
+            return self._numActive == 0 and time.monotonic() - self._lastActive > self.idleTimeout
+
+    def run(self):
+        """Import the modules and serve requests until idle
+
+        Raises
+        ------
+        RuntimeError
+            If the directory of the socket isn't private to this user.
+        """
+        _checkPrivate(os.path.dirname(os.path.abspath(self.socketPath)))
+        for name in self.preload:
+            try:
+                importlib.import_module(name)
+            except ImportError as exc:
+                print("Unable to preload %s: %s" % (name, exc), file=sys.stderr)
+        if os.path.exists(self.socketPath):
+            os.unlink(self.socketPath)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socketPath)
+        os.chmod(self.socketPath, 0o600)
+        listener.listen(128)
+        listener.settimeout(1.0)
+        print("Serving %d workers on %s" % (self.numWorkers, self.socketPath), flush=True)
+        try:
+            while not self._isIdle():
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                try:
+                    request = _readRequest(conn)
+                except (ValueError, OSError) as exc:
+                    print("Bad request: %s" % (exc,), file=sys.stderr)
+                    conn.close()
+                    continue
+                self._slots.acquire()
+                with self._lock:
+                    self._numActive += 1
+                stdoutRead, stdoutWrite = os.pipe()
+                stderrRead, stderrWrite = os.pipe()
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()  # From the main thread, so no other thread holds a lock we'll need
+                if pid == 0:
+                    listener.close()
+                    os.close(stdoutRead)
+                    os.close(stderrRead)
+                    conn.close()
+                    _runChild(request, stdoutWrite, stderrWrite)
+                try:
+                    os.setpgid(pid, pid)  # As in the child, so it's done before we might need to kill it
+                except OSError:
+                    pass  # The child has done it already, or has finished
+                os.close(stdoutWrite)
+                os.close(stderrWrite)
+                threading.Thread(target=self._relay, args=(conn, pid, stdoutRead, stderrRead),
+                                 daemon=True).start()
+        finally:
+            listener.close()
+            if os.path.exists(self.socketPath):
+                os.unlink(self.socketPath)
+
+
+def warmWorkers():
+    """Command-line interface for running a warm worker server
+
+    This is normally started by the first ``runInWorker.py`` client.
+    """
+    parser = argparse.ArgumentParser(description="Serve command-line tasks from pre-imported workers")
+    parser.add_argument("socket", help="Path of Unix socket on which to listen")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Maximum number of workers")
+    parser.add_argument("--idle-timeout", type=float, default=600.0,
+                        help="Exit after this long without requests (sec)")
+    args = parser.parse_args()
+    WorkerServer(args.socket, args.workers, args.idle_timeout).run()
@@ -0,0 +1,100 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import unittest
+
+import numpy
+import pandas
+
+import lsst.utils.tests
+from lsst.ci.hsc.gen2.aggregate import TableChecksum, getKeyColumns, checksumParquet
+
+
+class AggregateTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(12345)
+        self.tables = [pandas.DataFrame(dict(sourceId=numpy.arange(100*ii, 100*ii + 100),
+                                             parentSourceId=rng.randint(0, 10, 100),
+                                             flux=rng.normal(size=100))).set_index("sourceId")
+                       for ii in range(3)]
+
+    def writeTables(self, tempDir, tables, rowGroupSize=None, prefix="input"):
+        filenames = []
+        for ii, table in enumerate(tables):
+            filenames.append(os.path.join(tempDir, "%s%d.parq" % (prefix, ii)))
+            table.to_parquet(filenames[-1], row_group_size=rowGroupSize)
+        return filenames
+
+    def testChecksum(self):
+        """Checksums of the inputs add up to that of their concatenation,
+        regardless of order and row groups
+        """
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            inputs = self.writeTables(tempDir, self.tables, rowGroupSize=7)
+            output, = self.writeTables(tempDir, [pandas.concat(self.tables[::-1])], prefix="output")
+            columns = getKeyColumns(output, ["parentSourceId", "notPresent"])
+            self.assertEqual(columns, ["sourceId", "parentSourceId"])
+            total = TableChecksum(columns)
+            for filename in inputs:
+                total += checksumParquet(filename, columns)
+            checksum = checksumParquet(output, columns)
+            self.assertEqual(total.numRows, 300)
+            self.assertEqual(checksum.numRows, 300)
+            self.assertEqual(total.compare(checksum), [])
+
+            # A changed key and a duplicated key are caught
+            modified = pandas.concat(self.tables)
+            modified.iloc[-1, modified.columns.get_loc("parentSourceId")] += 1
+            sourceId = modified.index.to_numpy().copy()
+            sourceId[5] = sourceId[4]
+            modified.index = pandas.Index(sourceId, name="sourceId")
+            output, = self.writeTables(tempDir, [modified], prefix="modified")
+            self.assertEqual(total.compare(checksumParquet(output, columns)),
+                             ["sourceId", "parentSourceId"])
+
+    def testRangeIndex(self):
+        """An index that pandas stores as a range is regenerated"""
+        table = pandas.DataFrame(dict(flux=numpy.arange(50.0)))
+        table.index.name = "objectId"
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            filename, = self.writeTables(tempDir, [table], rowGroupSize=8)
+            self.assertEqual(getKeyColumns(filename), ["objectId"])
+            checksum = checksumParquet(filename, ["objectId"])
+        expected = TableChecksum(["objectId"])
+        expected.add(dict(objectId=numpy.arange(50)), 50)
+        self.assertEqual(checksum.numRows, 50)
+        self.assertEqual(checksum.compare(expected), [])
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,100 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import unittest
+import subprocess
+
+import lsst.utils.tests
+from lsst.utils import getPackageDir
+from lsst.ci.hsc.gen2.coreBudget import CoreBudget
+
+# Records when it started and finished
+SCRIPT = """import sys, time
+start = time.time()
+time.sleep(1.0)
+with open(sys.argv[1], "w") as fd:
+    fd.write("%f %f" % (start, time.time()))
+"""
+
+
+class CoreBudgetTestCase(lsst.utils.tests.TestCase):
+
+    def testReserve(self):
+        with lsst.utils.tests.temporaryDirectory() as lockDir:
+            budget = CoreBudget(lockDir, 3)
+            with budget.reserve(2) as num:
+                self.assertEqual(num, 2)
+                other = CoreBudget(lockDir, 3)  # e.g., in another process
+                with self.assertRaises(TimeoutError):
+                    with other.reserve(2, timeout=0.1, poll=0.01):
+                        pass
+                with other.reserve(1, timeout=0.1, poll=0.01) as num:
+                    self.assertEqual(num, 1)
+            with budget.reserve(10, timeout=0.1, poll=0.01) as num:
+                self.assertEqual(num, 3)  # Limited to the size of the budget
+
+    def runConcurrently(self, cores, budget):
+        """Run two commands at once through withCores.py
+
+        Returns
+        -------
+        times : `list` of `tuple` of `float`
+            Start and finish times of each command.
+        """
+        withCores = os.path.join(getPackageDir("ci_hsc_gen2"), "bin", "withCores.py")
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            script = os.path.join(tempDir, "script.py")
+            with open(script, "w") as fd:
+                fd.write(SCRIPT)
+            lockDir = os.path.join(tempDir, "cores")
+            outputs = [os.path.join(tempDir, "times-%d.txt" % (ii,)) for ii in range(2)]
+            processes = [subprocess.Popen([sys.executable, withCores, "--cores", str(cores),
+                                           "--budget", str(budget), "--lock-dir", lockDir,
+                                           "%s %s %s" % (sys.executable, script, out)])
+                         for out in outputs]
+            for proc in processes:
+                self.assertEqual(proc.wait(timeout=60), 0)
+            times = []
+            for out in outputs:
+                with open(out) as fd:
+                    times.append(tuple(float(value) for value in fd.read().split()))
+        return times
+
+    def testWithCores(self):
+        (start1, end1), (start2, end2) = self.runConcurrently(2, 4)
+        self.assertLess(max(start1, start2), min(end1, end2))  # Both fit in the budget, so overlap
+        (start1, end1), (start2, end2) = self.runConcurrently(2, 3)
+        self.assertGreaterEqual(max(start1, start2), min(end1, end2))  # Only one fits at a time
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,81 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+import numpy
+
+import lsst.utils.tests
+from lsst.ci.hsc.gen2.crossMatch import ARCSEC, RefCatIndex
+
+
+class RefCatIndexTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(12345)
+        num = 500
+        # Straddle RA=0 to check the wrap-around
+        self.ra = numpy.radians(rng.uniform(-0.1, 0.1, num) % 360)
+        self.dec = numpy.radians(rng.uniform(-0.1, 0.1, num))
+        self.index = RefCatIndex(self.ra, self.dec)
+
+    def testMatch(self):
+        offset = 0.3*ARCSEC
+        numSources = 100
+        ra = self.ra[:numSources] + offset/numpy.cos(self.dec[:numSources])
+        dec = self.dec[:numSources].copy()
+        ra[:10] += 1.0  # Far from any reference object
+        dec[10] = numpy.nan  # Not finite, so not matched
+        stats = self.index.match(ra, dec, radius=1.0*ARCSEC)
+        self.assertEqual(stats.numSources, numSources - 1)
+        self.assertEqual(stats.numMatches, numSources - 11)
+        numpy.testing.assert_array_equal(stats.sourceIndex, numpy.arange(11, numSources))
+        numpy.testing.assert_array_equal(stats.refIndex, numpy.arange(11, numSources))
+        self.assertFloatsAlmostEqual(stats.separation, offset, rtol=1.0e-4)
+        self.assertFloatsAlmostEqual(stats.medianSeparation, 0.3, rtol=1.0e-4)
+        self.assertFloatsAlmostEqual(stats.rmsSeparation, 0.3, rtol=1.0e-4)
+
+        # Nothing within a smaller radius
+        stats = self.index.match(ra, dec, radius=0.2*ARCSEC)
+        self.assertEqual(stats.numMatches, 0)
+        self.assertTrue(numpy.isnan(stats.medianSeparation))
+
+    def testEmpty(self):
+        stats = RefCatIndex([], []).match(self.ra, self.dec)
+        self.assertEqual(stats.numSources, len(self.ra))
+        self.assertEqual(stats.numMatches, 0)
+        stats = self.index.match([], [])
+        self.assertEqual(stats.numSources, 0)
+        self.assertEqual(stats.numMatches, 0)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,138 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+import numpy
+import pandas
+
+import lsst.utils.tests
+from lsst.utils import getPackageDir
+from lsst.daf.persistence import Butler as Butler2
+from lsst.daf.butler import Butler as Butler3
+from lsst.ci.hsc.gen2.equivalence import (translateDataId, compareArrays, compareExposures,
+                                          compareCatalogs, compareDataFrames)
+
+
+REPO_ROOT = os.path.join(getPackageDir("ci_hsc_gen2"), "DATA")
+GEN3_REPO_ROOT = os.path.join(getPackageDir("ci_hsc_gen2"), "DATAgen3")
+
+
+class WholeExposureButler:
+    """Butler proxy that can't read sub-images
+
+    Parameters
+    ----------
+    butler : `lsst.daf.persistence.Butler` or `lsst.daf.butler.Butler`
+        Butler to use.
+    offset : `float`
+        Amount to add to the first pixel of exposures that are read.
+    """
+    def __init__(self, butler, offset=0.0):
+        self.butler = butler
+        self.offset = offset
+        self.reads = []
+
+    def get(self, dataset, dataId, **kwargs):
+        if dataset.endswith("_sub") or "parameters" in kwargs:
+            raise RuntimeError("Reading sub-images isn't supported")
+        self.reads.append(dataset)
+        data = self.butler.get(dataset, dataId, **kwargs)
+        if self.offset and hasattr(data, "maskedImage"):
+            data.image.array[0, 0] += self.offset
+        return data
+
+
+class EquivalenceTestCase(lsst.utils.tests.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.butler2 = Butler2(os.path.join(REPO_ROOT, "rerun", "ci_hsc"))
+        cls.butler3 = Butler3(GEN3_REPO_ROOT, collections="HSC/runs/ci_hsc")
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.butler2
+        del cls.butler3
+
+    def setUp(self):
+        self.dataId2 = dict(visit=903334, ccd=16)
+        self.dataId3 = dict(visit=903334, detector=16, instrument="HSC")
+
+    def testTranslate(self):
+        skyMap = self.butler2.get("deepCoadd_skyMap")
+        dataId3 = dict(tract=0, patch=69, band="i", skymap="discrete/ci_hsc")
+        self.assertIn(dict(tract=0, patch="5,4", filter="HSC-I"),
+                      translateDataId(dataId3, skyMap, {"i": ["HSC-I"]}))
+        self.assertEqual(translateDataId(self.dataId3), [self.dataId2])
+
+    def testArrays(self):
+        self.assertEqual(compareArrays([1.0, numpy.nan], [1.0, numpy.nan]), 0)
+        self.assertEqual(compareArrays([1.0, 2.0], [1.0, 3.0]), 1)
+        self.assertEqual(compareArrays([1, 2], [1, 2, 3]), 3)
+
+    def testExposure(self):
+        self.assertEqual(compareExposures(self.butler2, self.butler3, "calexp", self.dataId2, self.dataId3,
+                                          chunkRows=1000), [])
+
+    def testExposureInMemory(self):
+        """Exposures are compared whole if sub-images can't be read"""
+        butler2 = WholeExposureButler(self.butler2)
+        butler3 = WholeExposureButler(self.butler3)
+        self.assertEqual(compareExposures(butler2, butler3, "calexp", self.dataId2, self.dataId3,
+                                          chunkRows=1000), [])
+        self.assertIn("calexp", butler2.reads)
+        self.assertIn("calexp", butler3.reads)
+        butler3 = WholeExposureButler(self.butler3, offset=1.0)
+        mismatches = compareExposures(butler2, butler3, "calexp", self.dataId2, self.dataId3)
+        self.assertEqual([kind for kind, _ in mismatches], ["image"])
+
+    def testDataFrame(self):
+        df2 = pandas.DataFrame(dict(flux=[1.0, numpy.nan, 3.0], flag=[True, False, True]),
+                               index=pandas.Index([10, 11, 12], name="sourceId"))
+        df3 = df2.copy()
+        self.assertEqual(compareDataFrames(df2, df3), [])
+        df3.loc[11, "flux"] = 2.0
+        df3["extra"] = 0
+        self.assertEqual([kind for kind, _ in compareDataFrames(df2, df3)], ["columns", "values"])
+        self.assertEqual([kind for kind, _ in compareDataFrames(df2, df3[:2])], ["rows"])
+
+    def testCatalog(self):
+        src2 = self.butler2.get("src", self.dataId2)
+        src3 = self.butler3.get("src", self.dataId3)
+        self.assertEqual(compareCatalogs(src2, src3), [])
+        src3 = src3.copy(deep=True)
+        src3["coord_ra"][0] += 1.0
+        self.assertEqual([kind for kind, _ in compareCatalogs(src2, src3)], ["values"])
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
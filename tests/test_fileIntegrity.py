@@ -0,0 +1,69 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+import lsst.utils.tests
+import lsst.afw.image
+from lsst.ci.hsc.gen2.fileIntegrity import (FitsStructureError, checkFitsStructure, checkFiles,
+                                            statFiles)
+
+
+class FileIntegrityTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.exposure = lsst.afw.image.ExposureF(123, 45)
+        self.exposure.image.array[:] = 1.0
+
+    def testGood(self):
+        with lsst.utils.tests.getTempFilePath(".fits") as filename:
+            self.exposure.writeFits(filename)
+            self.assertGreater(checkFitsStructure(filename), 1)
+            self.assertEqual(checkFiles([filename]), [None])
+            self.assertEqual(statFiles([filename]), [os.stat(filename).st_size])
+
+    def testTruncated(self):
+        with lsst.utils.tests.getTempFilePath(".fits") as filename:
+            self.exposure.writeFits(filename)
+            with open(filename, "rb") as fd:
+                contents = fd.read()
+            with open(filename, "wb") as fd:
+                fd.write(contents[:-2880])
+            with self.assertRaises(FitsStructureError):
+                checkFitsStructure(filename)
+            self.assertIsNotNone(checkFiles([filename])[0])
+
+    def testMissing(self):
+        self.assertEqual(statFiles(["/does/not/exist.fits"]), [None])
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
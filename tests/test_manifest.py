@@ -0,0 +1,85 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+from astropy.io import fits
+
+import lsst.utils.tests
+from lsst.ci.hsc.gen2.manifest import buildManifest, compareManifests, summarizeFile
+
+
+class ManifestTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "subdir"))
+        for filename, contents in (("first.txt", "foo"), (os.path.join("subdir", "second.txt"), "bar")):
+            with open(os.path.join(self.root, filename), "w") as fd:
+                fd.write(contents)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def testBuild(self):
+        manifest = buildManifest(self.root, numThreads=2)
+        self.assertEqual(set(manifest), {"first.txt", os.path.join("subdir", "second.txt")})
+        self.assertEqual(manifest["first.txt"]["size"], 3)
+        self.assertNotEqual(manifest["first.txt"]["hash"], manifest["subdir/second.txt"]["hash"])
+
+    def testFitsHdus(self):
+        """Columns with the same name in different HDUs are kept apart"""
+        filename = os.path.join(self.root, "catalog.fits")
+        tables = [fits.BinTableHDU.from_columns([fits.Column(name="flux", format="D", array=values)])
+                  for values in (numpy.array([1.0, 2.0, numpy.nan]), numpy.array([10.0, 30.0]))]
+        fits.HDUList([fits.PrimaryHDU()] + tables).writeto(filename)
+        entry = summarizeFile(filename)
+        self.assertEqual(entry["rows"], 5)
+        self.assertEqual(entry["means"], {"1:flux": 1.5, "2:flux": 20.0})
+
+    def testCompare(self):
+        manifest1 = buildManifest(self.root)
+        self.assertEqual(compareManifests(manifest1, manifest1), [])
+        manifest2 = {key: dict(value) for key, value in manifest1.items()}
+        del manifest2["first.txt"]
+        manifest2["subdir/second.txt"].update(hash="0", rows=10, means=dict(flux=1.0))
+        manifest1["subdir/second.txt"].update(rows=10, means=dict(flux=1.1))
+        kinds = {kind for _, kind, _ in compareManifests(manifest1, manifest2)}
+        self.assertEqual(kinds, {"missing", "means", "content"})
+        self.assertNotIn("means", {kind for _, kind, _ in compareManifests(manifest1, manifest2, rtol=0.2)})
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,85 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import lsst.utils.tests
+import lsst.geom
+import lsst.afw.geom
+from lsst.skymap import DiscreteSkyMap
+from lsst.ci.hsc.gen2.overlapIndex import OverlapIndex
+
+
+class OverlapIndexTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        config = DiscreteSkyMap.ConfigClass()
+        config.raList = [320.36749197602893]
+        config.decList = [0.3131554006070023]
+        config.radiusList = [1.4388796242707318]
+        config.projection = "TAN"
+        config.patchBorder = 100
+        config.tractOverlap = 0.0
+        config.pixelScale = 0.168
+        config.patchInnerDimensions = [4000, 4000]
+        self.skyMap = DiscreteSkyMap(config)
+        self.bbox = lsst.geom.Box2I(lsst.geom.Point2I(0, 0), lsst.geom.Extent2I(2048, 4176))
+
+    def makeWcs(self, ra, dec):
+        """Make a WCS for a CCD centered at the nominated position"""
+        return lsst.afw.geom.makeSkyWcs(lsst.geom.Box2D(self.bbox).getCenter(),
+                                        lsst.geom.SpherePoint(ra, dec, lsst.geom.degrees),
+                                        lsst.afw.geom.makeCdMatrix(0.168*lsst.geom.arcseconds))
+
+    def testIndex(self):
+        tractInfo = self.skyMap[0]
+        patchInfo = tractInfo.getPatchInfo((5, 4))
+        center = tractInfo.getWcs().pixelToSky(lsst.geom.Box2D(patchInfo.getInnerBBox()).getCenter())
+        ccdList = [(903334, 16, self.makeWcs(center.getRa().asDegrees(), center.getDec().asDegrees()),
+                    self.bbox),
+                   (903336, 17, self.makeWcs(center.getRa().asDegrees() + 0.5, center.getDec().asDegrees()),
+                    self.bbox)]
+        index = OverlapIndex.build(self.skyMap, ccdList)
+        self.assertIn((0, "5,4"), index.getPatches(903334, 16))
+        self.assertNotIn((0, "5,4"), index.getPatches(903336, 17))
+        self.assertEqual(index.getCcds(0, "5,4"), [(903334, 16)])
+        self.assertEqual(index.getCcds(0, (5, 4)), [(903334, 16)])
+        self.assertEqual(index.getPatches(1, 2), [])
+
+        with lsst.utils.tests.getTempFilePath(".npz") as filename:
+            index.write(filename)
+            copy = OverlapIndex.read(filename)
+        self.assertEqual(len(copy), len(index))
+        for visit, ccd, _, _ in ccdList:
+            self.assertEqual(copy.getPatches(visit, ccd), index.getPatches(visit, ccd))
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,110 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import threading
+import unittest
+
+import lsst.utils.tests
+from lsst.ci.hsc.gen2.prefetch import Prefetcher, PrefetchingButler
+
+
+class DummyButler:
+    """Butler that reads lists, with a file of a given size for each"""
+    def __init__(self, root, sizes, gate=None):
+        self.root = root
+        self.sizes = sizes  # Size of each dataset, by name
+        self.gate = gate  # Event to wait for before reading, or None
+        self.reads = []
+
+    def getUri(self, dataset, dataId):
+        filename = os.path.join(self.root, "%s-%d" % (dataset, dataId["visit"]))
+        if not os.path.exists(filename):
+            with open(filename, "wb") as fd:
+                fd.write(b"x"*self.sizes[dataset])
+        return filename
+
+    def get(self, dataset, dataId):
+        if self.gate is not None:
+            self.gate.wait()
+        self.reads.append((dataset, dataId["visit"]))
+        return [dataset, dataId["visit"]]
+
+
+class PrefetchTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.dataIdList = [dict(visit=visit) for visit in range(5)]
+        self.sizes = dict(calexp=300, src=100)
+
+    def testBudget(self):
+        """Reads in flight count against the memory budget"""
+        gate = threading.Event()
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            prefetcher = Prefetcher(lambda: DummyButler(tempDir, self.sizes, gate), list(self.sizes), depth=3,
+                                    maxBytes=1000, numThreads=2)
+            try:
+                prefetcher.schedule(self.dataIdList)
+                # Nothing has been read, but only two data identifiers fit
+                self.assertEqual(prefetcher.numBytes, 800)
+                self.assertIsNotNone(prefetcher.take("src", dict(visit=1)))
+                self.assertIsNone(prefetcher.take("src", dict(visit=2)))
+                prefetcher.release(dict(visit=0))
+                prefetcher.schedule(self.dataIdList[1:])
+                self.assertEqual(prefetcher.numBytes, 800)
+                self.assertIsNotNone(prefetcher.take("src", dict(visit=2)))
+            finally:
+                gate.set()
+                prefetcher.close()
+            self.assertEqual(prefetcher.numBytes, 0)
+
+    def testHandOut(self):
+        """Each prefetched dataset is handed out only once"""
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            butler = DummyButler(tempDir, self.sizes)
+            prefetcher = Prefetcher(lambda: DummyButler(tempDir, self.sizes), ["src"], depth=1)
+            proxy = PrefetchingButler(butler, prefetcher)
+            try:
+                prefetcher.schedule(self.dataIdList)
+                first = proxy.get("src", dict(visit=0))
+                self.assertEqual(first, ["src", 0])
+                self.assertEqual(butler.reads, [])  # Served by the prefetcher
+                first.append("modified")
+                self.assertEqual(proxy.get("src", dict(visit=0)), ["src", 0])
+                self.assertEqual(butler.reads, [("src", 0)])
+                self.assertEqual(proxy.get("calexp", dict(visit=0)), ["calexp", 0])
+                self.assertEqual(proxy.getUri("src", dict(visit=0)), os.path.join(tempDir, "src-0"))
+            finally:
+                prefetcher.close()
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
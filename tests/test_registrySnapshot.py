@@ -0,0 +1,71 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sqlite3
+import unittest
+
+import lsst.utils.tests
+from lsst.utils import getPackageDir
+from lsst.daf.persistence import Butler
+from lsst.daf.persistence import registries
+from lsst.ci.hsc.gen2.registrySnapshot import loadSnapshot, useRegistrySnapshots
+
+
+REPO_ROOT = os.path.join(getPackageDir("ci_hsc_gen2"), "DATA")
+
+
+class RegistrySnapshotTestCase(lsst.utils.tests.TestCase):
+
+    def testSnapshot(self):
+        filename = os.path.join(REPO_ROOT, "registry.sqlite3")
+        uri = loadSnapshot(filename)
+        self.assertEqual(loadSnapshot(filename), uri)  # Not reloaded
+        query = "SELECT visit, ccd FROM raw ORDER BY visit, ccd"
+        snapshot = sqlite3.connect(uri, uri=True)
+        direct = sqlite3.connect(filename)
+        try:
+            self.assertEqual(snapshot.execute(query).fetchall(), direct.execute(query).fetchall())
+        finally:
+            snapshot.close()
+            direct.close()
+
+    def testButler(self):
+        dataId = dict(visit=903334, ccd=16)
+        expected = Butler(REPO_ROOT).queryMetadata("raw", ["visit", "ccd"], dataId)
+        self.addCleanup(setattr, registries, "SqliteRegistry", registries.SqliteRegistry)
+        useRegistrySnapshots()
+        butler = Butler(os.path.join(REPO_ROOT, "rerun", "ci_hsc"))
+        self.assertEqual(butler.queryMetadata("raw", ["visit", "ccd"], dataId), expected)
+        self.assertTrue(butler.datasetExists("calexp", dataId))
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,125 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import json
+import unittest
+from xml.etree import ElementTree
+
+import lsst.utils.tests
+from lsst.ci.hsc.gen2.results import ResultRecorder, RecordingButler
+
+
+class DummyButler:
+    def __init__(self, filename):
+        self.filename = filename
+
+    def get(self, dataset, dataId):
+        if dataset == "missing":
+            raise RuntimeError("No such dataset")
+        return dataset
+
+    def getUri(self, dataset, dataId):
+        return self.filename
+
+    def datasetExists(self, dataset, dataId):
+        return dataset != "missing"
+
+
+class ResultRecorderTestCase(lsst.utils.tests.TestCase):
+
+    def makeRecorder(self):
+        recorder = ResultRecorder("SfmValidation")
+        recorder.dataId = dict(visit=903334, ccd=16)
+        recorder.mark()
+        recorder.addCheck("Number of sources", True)
+        recorder.addCheck("Number of matches", False)
+        recorder.addError(RuntimeError("Boom"))
+        return recorder
+
+    def testRecords(self):
+        recorder = self.makeRecorder()
+        self.assertEqual([record["outcome"] for record in recorder.records], ["pass", "fail", "error"])
+        self.assertEqual(recorder.failures, recorder.records[1:])
+        self.assertEqual(recorder.records[2]["message"], "RuntimeError: Boom")
+        self.assertEqual(recorder.records[2]["name"], "Validation of {'visit': 903334, 'ccd': 16}")
+        self.assertTrue(recorder.summarize().startswith("3 checks (2 failed)"))
+
+    def testWriteJson(self):
+        """Rewriting the results replaces, rather than appends to, them"""
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            filename = os.path.join(tempDir, "results.jsonl")
+            self.makeRecorder().write(filename)
+            recorder = ResultRecorder("SfmValidation")
+            recorder.addCheck("Number of sources", True)
+            recorder.write(filename)
+            with open(filename) as fd:
+                records = [json.loads(line) for line in fd]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["name"], "Number of sources")
+        self.assertEqual(records[0]["outcome"], "pass")
+
+    def testWriteJUnit(self):
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            filename = os.path.join(tempDir, "results.xml")
+            self.makeRecorder().write(filename)
+            suite = ElementTree.parse(filename).getroot().find("testsuite")
+        self.assertEqual(suite.get("name"), "SfmValidation")
+        self.assertEqual((suite.get("tests"), suite.get("failures"), suite.get("errors")), ("3", "1", "1"))
+        cases = suite.findall("testcase")
+        self.assertIsNone(cases[0].find("failure"))
+        self.assertIsNotNone(cases[1].find("failure"))
+        self.assertEqual(cases[2].find("error").get("message"), "RuntimeError: Boom")
+
+
+class RecordingButlerTestCase(lsst.utils.tests.TestCase):
+
+    def testRecord(self):
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            filename = os.path.join(tempDir, "calexp.fits")
+            with open(filename, "wb") as fd:
+                fd.write(b"x"*1234)
+            recorder = ResultRecorder("SfmValidation")
+            butler = RecordingButler(DummyButler(filename), recorder)
+            dataId = dict(visit=903334, ccd=16)
+            self.assertEqual(butler.get("calexp", dataId), "calexp")
+            self.assertTrue(butler.datasetExists("calexp", dataId))
+            with self.assertRaises(RuntimeError):
+                butler.get("missing", dataId)
+            self.assertEqual(butler.getUri("calexp", dataId), filename)  # Passed through
+        self.assertEqual([(record["kind"], record["name"], record["bytes"], record["outcome"]) for
+                          record in recorder.records],
+                         [("get", "calexp", 1234, "pass"), ("datasetExists", "calexp", 0, "pass"),
+                          ("get", "missing", 0, "error")])
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
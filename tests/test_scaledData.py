@@ -0,0 +1,74 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import lsst.utils.tests
+import lsst.afw.image
+from lsst.ci.hsc.gen2.scaledData import MAX_VISIT, readCards, getVisitOffsets, replicateRaw
+
+
+class ScaledDataTestCase(lsst.utils.tests.TestCase):
+
+    def testOffsets(self):
+        visits = [903334, 903336, 904014]
+        offsets = getVisitOffsets(visits, 100)
+        self.assertEqual(offsets[0], 0)
+        replicas = [visit + offset for offset in offsets for visit in visits]
+        self.assertEqual(len(set(replicas)), len(replicas))
+        self.assertTrue(all(0 < visit <= MAX_VISIT and visit % 2 == 0 for visit in replicas))
+        with self.assertRaises(ValueError):
+            getVisitOffsets(visits, 10000)
+
+    def testReplicate(self):
+        exposure = lsst.afw.image.ExposureF(12, 34)
+        exposure.image.array[:] = 1.0
+        metadata = exposure.getMetadata()
+        metadata.set("EXP-ID", "HSCE00903334")
+        metadata.set("FRAMEID", "HSCA90333416")
+        metadata.set("CRVAL1", 320.0)
+        metadata.set("CRVAL2", -0.5)
+        keywords = ["EXP-ID", "FRAMEID", "CRVAL1", "CRVAL2"]
+        with lsst.utils.tests.getTempFilePath(".fits") as source:
+            exposure.writeFits(source)
+            with lsst.utils.tests.getTempFilePath(".fits") as target:
+                replicateRaw(source, target, 1000, 0.001, -0.002)
+                values = readCards(target, keywords)
+                self.assertEqual(values["EXP-ID"], "HSCE00904334")
+                self.assertEqual(values["FRAMEID"], "HSCA90433416")
+                self.assertFloatsAlmostEqual(values["CRVAL1"], 320.001, atol=1.0e-12)
+                self.assertFloatsAlmostEqual(values["CRVAL2"], -0.502, atol=1.0e-12)
+                replica = lsst.afw.image.ExposureF(target)
+                self.assertImagesEqual(replica.image, exposure.image)
+            self.assertEqual(readCards(source, keywords)["EXP-ID"], "HSCE00903334")
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,137 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import unittest
+
+import numpy
+import pandas
+
+import lsst.utils.tests
+import lsst.afw.table as afwTable
+from lsst.ci.hsc.gen2.snapshot import (summarizeCatalog, getSnapshotFilename, writeSnapshot, readSnapshot,
+                                       compareSnapshots)
+
+
+class SnapshotTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(12345)
+        num = 1000
+        self.catalog = pandas.DataFrame(dict(
+            slot_Centroid_x=rng.uniform(0, 2000, num),
+            slot_Centroid_y=rng.uniform(0, 4000, num),
+            base_SdssCentroid_x=rng.uniform(0, 2000, num),
+            base_SdssCentroid_y=rng.uniform(0, 4000, num),
+            slot_PsfFlux_instFlux=rng.lognormal(8, 1, num),
+            slot_CalibFlux_instFlux=rng.lognormal(8, 1, num),
+            base_PsfFlux_flag=rng.uniform(size=num) < 0.1,
+            calib_photometry_used=rng.uniform(size=num) < 0.2,
+        ))
+
+    def testSummarize(self):
+        summary = summarizeCatalog(self.catalog)
+        self.assertEqual(summary["numRows"][0], len(self.catalog))
+        self.assertEqual(summary["fluxNames"].tolist(), ["slot_CalibFlux_instFlux", "slot_PsfFlux_instFlux"])
+        self.assertEqual(summary["centroidNames"].tolist(), ["base_SdssCentroid"])
+        self.assertEqual(summary["flagNames"].tolist(), ["base_PsfFlux_flag", "calib_photometry_used"])
+        self.assertFloatsAlmostEqual(summary["flagRates"][0, 0], self.catalog["base_PsfFlux_flag"].mean())
+        self.assertEqual(summary["matchedQuantiles"].shape, (1, 5))
+
+    def testSourceCatalog(self):
+        """The slot aliases of an afw catalog are resolved"""
+        schema = afwTable.SourceTable.makeMinimalSchema()
+        for name in ("base_SdssCentroid_x", "base_SdssCentroid_y", "base_GaussianCentroid_x",
+                     "base_GaussianCentroid_y", "base_PsfFlux_instFlux",
+                     "base_CircularApertureFlux_12_0_instFlux"):
+            schema.addField(name, type="D", doc=name)
+        matchedKey = schema.addField("calib_photometry_used", type="Flag", doc="Used for calibration")
+        aliases = schema.getAliasMap()
+        aliases.set("slot_Centroid", "base_SdssCentroid")
+        aliases.set("slot_PsfFlux", "base_PsfFlux")
+        aliases.set("slot_CalibFlux", "base_CircularApertureFlux_12_0")
+        catalog = afwTable.SourceCatalog(schema)
+        num = len(self.catalog)
+        for ii in range(num):
+            record = catalog.addNew()
+            record.set(matchedKey, bool(self.catalog["calib_photometry_used"][ii]))
+        xx = self.catalog["slot_Centroid_x"].to_numpy()
+        yy = self.catalog["slot_Centroid_y"].to_numpy()
+        flux = self.catalog["slot_CalibFlux_instFlux"].to_numpy()
+        catalog["base_SdssCentroid_x"] = xx
+        catalog["base_SdssCentroid_y"] = yy
+        catalog["base_GaussianCentroid_x"] = xx + 3.0
+        catalog["base_GaussianCentroid_y"] = yy - 4.0
+        catalog["base_CircularApertureFlux_12_0_instFlux"] = flux
+        catalog["base_PsfFlux_instFlux"] = 2.0*flux
+
+        summary = summarizeCatalog(catalog)
+        self.assertEqual(summary["numRows"][0], num)
+        self.assertIn("slot_PsfFlux_instFlux", summary["fluxNames"].tolist())
+        self.assertEqual(summary["centroidNames"].tolist(), ["base_GaussianCentroid", "base_SdssCentroid"])
+        self.assertFloatsAlmostEqual(summary["centroidOffsets"][0], 5.0, rtol=1.0e-12)
+        self.assertFloatsAlmostEqual(summary["centroidOffsets"][1], 0.0, atol=0.0)
+        self.assertEqual(summary["matchedNames"].tolist(),
+                         ["slot_PsfFlux_instFlux/slot_CalibFlux_instFlux"])
+        self.assertFloatsAlmostEqual(summary["matchedQuantiles"][0], 2.0, rtol=1.0e-12)
+
+    def testRoundTrip(self):
+        summary = summarizeCatalog(self.catalog)
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            filename = getSnapshotFilename(tempDir, "src", dict(visit=903334, ccd=16))
+            self.assertEqual(os.path.basename(filename), "ccd=16_visit=903334.npz")
+            writeSnapshot(filename, summary)
+            reference = readSnapshot(filename)
+        self.assertEqual(set(reference), set(summary))
+        for key in summary:
+            self.assertEqual(reference[key].tolist(), summary[key].tolist())
+        self.assertEqual(compareSnapshots(reference, summary), {})
+
+    def testCompare(self):
+        reference = summarizeCatalog(self.catalog)
+        catalog = self.catalog.copy()
+        catalog["slot_PsfFlux_instFlux"] *= 1.005  # Within tolerance
+        self.assertEqual(compareSnapshots(reference, summarizeCatalog(catalog)), {})
+        catalog["slot_PsfFlux_instFlux"] *= 1.1
+        catalog["base_PsfFlux_flag"] = True
+        catalog = catalog.drop(columns=["base_SdssCentroid_x"])
+        failures = compareSnapshots(reference, summarizeCatalog(catalog))
+        self.assertEqual(failures["flux"], ["slot_PsfFlux_instFlux"])
+        self.assertEqual(failures["flag"], ["base_PsfFlux_flag"])
+        self.assertEqual(failures["matched"], ["slot_PsfFlux_instFlux/slot_CalibFlux_instFlux"])
+        self.assertEqual(failures["missing"], ["base_SdssCentroid"])
+        self.assertNotIn("numRows", failures)
+        self.assertEqual(compareSnapshots(reference, summarizeCatalog(self.catalog[:900]))["numRows"],
+                         ["900 != 1000"])
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,101 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import lsst.utils.tests
+from lsst.ci.hsc.gen2.stagingCache import StagingCache
+
+
+class StagingCacheTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tempDir, "source")
+        os.makedirs(os.path.join(self.source, "sub"))
+        for name in ("one.fits", os.path.join("sub", "two.fits")):
+            with open(os.path.join(self.source, name), "w") as fd:
+                fd.write("contents")
+        os.symlink("one.fits", os.path.join(self.source, "link.fits"))
+        os.symlink(os.path.join("..", "one.fits"), os.path.join(self.source, "sub", "up.fits"))
+        os.symlink("missing.fits", os.path.join(self.source, "dangling.fits"))
+        self.outside = os.path.join(self.tempDir, "outside")
+        os.makedirs(self.outside)
+        with open(os.path.join(self.outside, "three.fits"), "w") as fd:
+            fd.write("outside")
+        os.symlink(os.path.join("..", "outside", "three.fits"), os.path.join(self.source, "three.fits"))
+        os.symlink(os.path.join("..", "outside"), os.path.join(self.source, "outsideDir"))
+        self.cacheDir = os.path.join(self.tempDir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def testStage(self):
+        cache = StagingCache(self.cacheDir)
+        staged = cache.stage(self.source)
+        self.assertTrue(staged.startswith(self.cacheDir))
+        with open(os.path.join(staged, "sub", "two.fits")) as fd:
+            self.assertEqual(fd.read(), "contents")
+        self.assertEqual(os.readlink(os.path.join(staged, "link.fits")), "one.fits")
+        self.assertEqual(os.readlink(os.path.join(staged, "sub", "up.fits")), os.path.join("..", "one.fits"))
+        self.assertEqual(os.readlink(os.path.join(staged, "dangling.fits")), "missing.fits")
+        # Links resolving outside the source are followed, so they don't dangle
+        for name in ("three.fits", os.path.join("outsideDir", "three.fits")):
+            path = os.path.join(staged, name)
+            self.assertFalse(os.path.islink(path))
+            with open(path) as fd:
+                self.assertEqual(fd.read(), "outside")
+        # Identical files are stored once
+        self.assertEqual(cache.numBytes, len("contents") + len("outside"))
+        self.assertEqual(cache.stage(self.source), staged)
+
+        with open(os.path.join(self.source, "one.fits"), "w") as fd:
+            fd.write("changed")
+        changed = cache.stage(self.source)
+        self.assertNotEqual(changed, staged)
+        with open(os.path.join(changed, "one.fits")) as fd:
+            self.assertEqual(fd.read(), "changed")
+
+    def testEvict(self):
+        cache = StagingCache(self.cacheDir, maxBytes=10, protectTime=0.0)
+        staged = cache.stage(self.source)
+        other = os.path.join(self.tempDir, "other")
+        with open(other, "w") as fd:
+            fd.write("some other contents")
+        self.assertTrue(os.path.exists(cache.stage(other)))
+        self.assertFalse(os.path.exists(staged))
+        self.assertEqual(cache.numBytes, len("some other contents"))
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
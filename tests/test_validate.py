@@ -0,0 +1,111 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import unittest
+from types import SimpleNamespace
+
+from astropy.io import fits
+
+import lsst.utils.tests
+from lsst.ci.hsc.gen2.results import ResultRecorder
+from lsst.ci.hsc.gen2.validate import Validation
+
+
+class DummyButler:
+    """Butler with a file for each dataset, which may be missing"""
+    def __init__(self, root):
+        self.root = root
+
+    def getUri(self, dataset, dataId):
+        return os.path.join(self.root, "%s-%d.fits" % (dataset, dataId["visit"]))
+
+
+class DummyGen3Butler(DummyButler):
+    """Like DummyButler, but returning URIs like a Gen3 butler"""
+    getUri = None
+
+    def getURI(self, dataset, dataId):
+        return SimpleNamespace(ospath=DummyButler.getUri(self, dataset, dataId))
+
+
+class FileValidation(Validation):
+    _files = ["calexp"]
+
+
+class ValidateFilesTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.dataIdList = [dict(visit=visit) for visit in (1, 2, 3)]
+
+    def makeValidator(self, root, gen3=False, **kwargs):
+        """Make a validator for which visit 1 is good, visit 2 is missing and
+        visit 3 is empty
+        """
+        fits.PrimaryHDU().writeto(os.path.join(root, "calexp-1.fits"))
+        open(os.path.join(root, "calexp-3.fits"), "wb").close()
+        validator = FileValidation(root, gen3=gen3, **kwargs)
+        validator._butler = (DummyGen3Butler if gen3 else DummyButler)(root)
+        return validator
+
+    def testCollect(self):
+        """A missing file is recorded as a failure, not raised"""
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            validator = self.makeValidator(tempDir, collectFailures=True, checkFits=True,
+                                           recorder=ResultRecorder("FileValidation"))
+            validator.runAll(self.dataIdList)
+        self.assertEqual(len(validator.failures), 3)
+        self.assertTrue(validator.failures[0].startswith("calexp exists on disk for {'visit': 2}"))
+        self.assertTrue(validator.failures[1].startswith("calexp has non-zero size for {'visit': 3}"))
+        self.assertTrue(validator.failures[2].startswith("calexp has valid FITS structure for {'visit': 3}"))
+        self.assertEqual([record["outcome"] for record in validator.recorder.failures], ["fail"]*3)
+
+    def testGen3(self):
+        """Filenames are obtained from the URIs of a Gen3 butler"""
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            validator = self.makeValidator(tempDir, gen3=True, collectFailures=True, checkFits=True)
+            self.assertEqual(validator.getFilename("calexp", dict(visit=1)),
+                             os.path.join(tempDir, "calexp-1.fits"))
+            validator.validateFiles(self.dataIdList, ["calexp"])
+        self.assertEqual(len(validator.failures), 3)
+        self.assertTrue(validator.failures[0].startswith("calexp exists on disk for {'visit': 2}"))
+
+    def testRaise(self):
+        """Without collecting, the first failure is raised"""
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            validator = self.makeValidator(tempDir)
+            with self.assertRaises(AssertionError) as context:
+                validator.runAll(self.dataIdList)
+        self.assertIn("calexp exists on disk for {'visit': 2}", str(context.exception))
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,165 @@
+# This file is part of ci_hsc.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import sys
+import time
+import signal
+import unittest
+import subprocess
+
+import lsst.utils.tests
+from lsst.utils import getPackageDir
+
+SERVER = ("import sys; from lsst.ci.hsc.gen2.workerPool import WorkerServer; "
+          "WorkerServer(sys.argv[1], 2, idleTimeout=1.0, preload=()).run()")
+SCRIPT = """import os, sys
+print("args=%s" % (sys.argv[1:],))
+print("cwd=%s" % (os.getcwd(),), file=sys.stderr)
+sys.exit(int(sys.argv[1]))
+"""
+# Records its process ID, then takes a long time
+SLOW_SCRIPT = """import os, sys, time
+with open(sys.argv[1] + ".tmp", "w") as fd:
+    fd.write(str(os.getpid()))
+os.rename(sys.argv[1] + ".tmp", sys.argv[1])
+time.sleep(60)
+"""
+# Server that accepts a request, then goes away without running it
+DROPPING_SERVER = """import sys, socket
+listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+listener.bind(sys.argv[1])
+listener.listen(1)
+conn, _ = listener.accept()
+data = b"x"
+while data and not data.endswith(b"\\n"):
+    data = conn.recv(65536)
+conn.close()
+"""
+MARKER_SCRIPT = """import sys
+open(sys.argv[1], "a").write("ran\\n")
+"""
+
+
+class WorkerPoolTestCase(lsst.utils.tests.TestCase):
+
+    def testRun(self):
+        client = os.path.join(getPackageDir("ci_hsc_gen2"), "bin", "runInWorker.py")
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            socketPath = os.path.join(tempDir, "workers.sock")
+            script = os.path.join(tempDir, "script.py")
+            with open(script, "w") as fd:
+                fd.write(SCRIPT)
+            server = subprocess.Popen([sys.executable, "-c", SERVER, socketPath])
+            try:
+                deadline = time.monotonic() + 30
+                while not os.path.exists(socketPath) and time.monotonic() < deadline:
+                    time.sleep(0.1)
+                for code in (0, 3):
+                    result = subprocess.run([sys.executable, client, "--socket", socketPath, script,
+                                             str(code), "--id", "visit=1"],
+                                            cwd=tempDir, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                            universal_newlines=True)
+                    self.assertEqual(result.returncode, code)
+                    self.assertIn("args=%s" % ([str(code), "--id", "visit=1"],), result.stdout)
+                    self.assertIn("cwd=%s" % (os.path.realpath(tempDir),), result.stderr)
+                    self.assertNotIn("cwd=", result.stdout)
+                self.assertEqual(server.wait(timeout=30), 0)  # Exits when idle
+            finally:
+                if server.poll() is None:
+                    server.kill()
+                    server.wait()
+
+    def testLostServer(self):
+        """A request that was sent isn't run again if the server goes away"""
+        client = os.path.join(getPackageDir("ci_hsc_gen2"), "bin", "runInWorker.py")
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            socketPath = os.path.join(tempDir, "workers.sock")
+            script = os.path.join(tempDir, "script.py")
+            marker = os.path.join(tempDir, "marker.txt")
+            with open(script, "w") as fd:
+                fd.write(MARKER_SCRIPT)
+            server = subprocess.Popen([sys.executable, "-c", DROPPING_SERVER, socketPath])
+            try:
+                deadline = time.monotonic() + 30
+                while not os.path.exists(socketPath) and time.monotonic() < deadline:
+                    time.sleep(0.1)
+                result = subprocess.run([sys.executable, client, "--socket", socketPath, script, marker],
+                                        cwd=tempDir, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        universal_newlines=True)
+                self.assertNotEqual(result.returncode, 0)
+                self.assertIn("Lost connection", result.stderr)
+                self.assertFalse(os.path.exists(marker))
+                self.assertEqual(server.wait(timeout=30), 0)
+            finally:
+                if server.poll() is None:
+                    server.kill()
+                    server.wait()
+
+    def testInterrupted(self):
+        """A task is killed if its client goes away"""
+        client = os.path.join(getPackageDir("ci_hsc_gen2"), "bin", "runInWorker.py")
+        with lsst.utils.tests.temporaryDirectory() as tempDir:
+            socketPath = os.path.join(tempDir, "workers.sock")
+            script = os.path.join(tempDir, "script.py")
+            pidFile = os.path.join(tempDir, "pid.txt")
+            with open(script, "w") as fd:
+                fd.write(SLOW_SCRIPT)
+            server = subprocess.Popen([sys.executable, "-c", SERVER, socketPath])
+            try:
+                deadline = time.monotonic() + 30
+                while not os.path.exists(socketPath) and time.monotonic() < deadline:
+                    time.sleep(0.1)
+                proc = subprocess.Popen([sys.executable, client, "--socket", socketPath, script, pidFile],
+                                        cwd=tempDir)
+                while not os.path.exists(pidFile) and time.monotonic() < deadline:
+                    time.sleep(0.1)
+                with open(pidFile) as fd:
+                    pid = int(fd.read())
+                proc.send_signal(signal.SIGTERM)
+                proc.wait(timeout=30)
+                while time.monotonic() < deadline:
+                    try:
+                        os.kill(pid, 0)
+                    except ProcessLookupError:
+                        break
+                    time.sleep(0.1)
+                else:
+                    self.fail("Task is still running after its client went away")
+                self.assertEqual(server.wait(timeout=30), 0)
+            finally:
+                if server.poll() is None:
+                    server.kill()
+                    server.wait()
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()